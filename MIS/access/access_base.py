@@ -2,8 +2,8 @@ from psycopg_pool import AsyncConnectionPool
 from psycopg.rows import dict_row
 import logging
 import os
-from psycopg import AsyncCursor
-from psycopg.sql import SQL
+from psycopg import AsyncConnection, AsyncCursor
+from psycopg.sql import SQL, Identifier
 
 from dotenv import load_dotenv
 
@@ -68,3 +68,26 @@ class AccessBase:
     async def db_execute(sql, values=None, cursor: AsyncCursor = None) -> None:
         assert cursor is not None
         await cursor.execute(SQL(sql), values)
+
+    @staticmethod
+    async def db_execute_atomic(statements: list[tuple[str, tuple]]) -> None:
+        """Execute (sql, values) statements in a single transaction."""
+        await AccessBase.pool.open()
+        async with AccessBase.pool.connection(30) as conn:
+            async with conn.transaction():
+                for sql, values in statements:
+                    await conn.execute(SQL(sql), values)
+
+    @staticmethod
+    async def db_listen(channel: str):
+        """Yield payloads of notifications sent on a channel.
+
+        Listens on a dedicated connection, since a pooled connection would
+        be held for as long as the listener runs.
+        """
+        async with await AsyncConnection.connect(
+            AccessBase.connection_string, autocommit=True
+        ) as conn:
+            await conn.execute(SQL("LISTEN {};").format(Identifier(channel)))
+            async for notify in conn.notifies():
+                yield notify.payload
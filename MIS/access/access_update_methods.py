@@ -165,3 +165,135 @@ async def update_table(
     except Exception as e:
         print(f"Error updating table: {e}")
         raise e
+
+
+async def claim_from_table(
+    model: Type[BaseModelSubClass],
+    transitions: Dict[Any, Any],
+    key_name: str,
+    owner: str,
+    lease_seconds: float,
+    limit: int = 1,
+    conditions: Dict[str, Any] | None = None,
+    ready_field: str | None = None,
+    counter_field: str | None = None,
+    order_by: str | None = None,
+    order_params: tuple = (),
+    owner_field: str = "claimed_by",
+    lease_field: str = "lease_expires"
+) -> List[BaseModelSubClass]:
+    """
+    Atomically claim up to limit rows for processing by owner.
+
+    Rows whose key_name column holds a key of transitions are moved to the
+    matching in-progress value, and rows left in an in-progress value by an
+    owner whose lease has expired are reclaimed. Claimed rows are leased to
+    owner for lease_seconds. Rows locked by concurrent claims are skipped,
+    so each row is claimed by at most one owner at a time.
+
+    Only rows matching conditions are claimed, and with ready_field only
+    rows where it is NULL or in the past. counter_field, if given, is
+    incremented on every claim. Rows are claimed in order of the order_by
+    SQL expression, with placeholders filled from order_params, else in
+    primary key order.
+    """
+    assert issubclass(model, DatabaseModel), \
+        f"Object is not a Database Pydantic model: {model}"
+    assert isinstance(model.__primarykey__, str), \
+        "Claiming requires a single column primary key."
+
+    conditions = conditions or {}
+    valid_fields = model.__fields__.keys()
+    fields = [key_name, owner_field, lease_field, *conditions.keys()]
+    fields += [key for key in (ready_field, counter_field) if key]
+    for key in fields:
+        if key not in valid_fields:
+            raise ValueError(f"Invalid claim field: {key}")
+
+    if limit < 1 or not transitions:
+        return []
+
+    table_name = model.__tablename__
+    primary_key = model.__primarykey__
+    pending = list(transitions.keys())
+    in_progress = list(set(transitions.values()))
+
+    # Move pending rows to their in-progress value, keep reclaimed rows
+    case_clause = ' '.join(['WHEN %s THEN %s'] * len(transitions))
+    pending_placeholders = ', '.join(['%s'] * len(pending))
+    progress_placeholders = ', '.join(['%s'] * len(in_progress))
+
+    # Optional filters and counter
+    filter_clause = ''.join(f" AND {key} = %s" for key in conditions)
+    if ready_field:
+        filter_clause += (f" AND ({ready_field} IS NULL"
+                          f" OR {ready_field} <= now())")
+    counter_clause = ''
+    if counter_field:
+        counter_clause = f", {counter_field} = {counter_field} + 1"
+
+    sql = f"""
+        UPDATE public.{table_name}
+        SET {key_name} = CASE {key_name} {case_clause}
+                         ELSE {key_name} END,
+            {owner_field} = %s,
+            {lease_field} = now() + make_interval(secs => %s)
+            {counter_clause}
+        WHERE {primary_key} IN (
+            SELECT {primary_key} FROM public.{table_name}
+            WHERE ({key_name} IN ({pending_placeholders})
+                   OR ({key_name} IN ({progress_placeholders})
+                       AND {lease_field} < now())){filter_clause}
+            ORDER BY {order_by or primary_key}
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING *;
+    """
+    parameters = tuple(
+        item for transition in transitions.items() for item in transition
+    ) + (owner, lease_seconds) + tuple(pending) + tuple(in_progress) \
+        + tuple(conditions.values()) + tuple(order_params) + (limit,)
+
+    try:
+        return await AccessBase.db_fetchall(
+            sql,
+            parameters,
+            lambda row: model(**row)
+        )
+    except Exception as e:
+        print(f"Error claiming from table: {e}")
+        raise e
+
+
+async def renew_claim(
+    obj: BaseModelSubClass,
+    owner: str,
+    lease_seconds: float,
+    owner_field: str = "claimed_by",
+    lease_field: str = "lease_expires"
+) -> bool:
+    """
+    Extend the lease of a row claimed by owner.
+    Returns False if the row is no longer claimed by owner.
+    """
+    assert issubclass(type(obj), DatabaseModel), \
+        f"Object is not a Database Pydantic model: {obj}"
+
+    primary_key = obj.__primarykey__
+    sql = f"""
+        UPDATE public.{obj.__tablename__}
+        SET {lease_field} = now() + make_interval(secs => %s)
+        WHERE {primary_key} = %s AND {owner_field} = %s
+        RETURNING {primary_key};
+    """
+
+    try:
+        row = await AccessBase.db_fetchone(
+            sql,
+            (lease_seconds, getattr(obj, primary_key), owner)
+        )
+        return row is not None
+    except Exception as e:
+        print(f"Error renewing claim: {e}")
+        raise e
@@ -1,168 +1,778 @@
+import numpy as np
+import pandas as pd
 import torch
 import whisperx
-import gc
-import json
+import inspect
 import logging
+import multiprocessing
 import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from time import monotonic
 
+from .admission import AdmissionController
+from .asr_cache import StageCache
+from .asr_profile import ASRProfile
+from .audio_store import AudioStore, SAMPLE_RATE
+from .model_registry import ModelRegistry
+from .speaker_store import SpeakerStore
+from .stage_graph import StageGraph
+from .transcript_writer import TranscriptWriter
+from .vad import SpeechMap
+from .word_store import WordStoreWriter
+
+
+# Rough resident size (in MB) of each model at full precision, used to keep
+# warm models within the ASR_MODEL_MEMORY_MB budget
+MODEL_SIZES = {
+    "tiny": 150,
+    "base": 300,
+    "small": 950,
+    "medium": 3000,
+    "large-v2": 6200,
+    "large-v3": 6200,
+    "distil-large-v2": 3000,
+    "distil-large-v3": 3000,
+}
+ALIGN_MODEL_SIZE = 1300
+DIARIZE_MODEL_SIZE = 300
+
+DEFAULT_DIARIZE_MODEL = "pyannote/speaker-diarization-3.1"
+
+# Shortest span (in seconds) worth giving its own transcription worker
+MIN_WORKER_SPAN = 60
+
+# Warm models of a parallel transcription worker process
+_worker_models = ModelRegistry()
+
+
+def _init_transcribe_worker(threads: int):
+    """Limit the threads used by a parallel transcription worker."""
+    torch.set_num_threads(threads)
+
+
+def _transcribe_span(pcm_path: str, start: int, end: int, model_size: str,
+                     compute_type: str, batch_size: int, threads: int,
+                     language: str | None) -> dict:
+    """Transcribe one span of a PCM file in a worker process.
+
+    The span is memory-mapped from the PCM file, so audio is never copied
+    between processes. Timestamps are relative to the whole file.
+    """
+    def load():
+        return whisperx.load_model(model_size, "cpu",
+                                   compute_type=compute_type,
+                                   threads=threads)
+
+    key = ("whisper", model_size, compute_type, "cpu")
+    model = _worker_models.get(key, load)
+
+    audio = np.memmap(pcm_path, dtype=np.float32, mode="c")[start:end]
+
+    # A warm model keeps the language of its first transcription unless
+    # given one, so detect the language of each span without a hint
+    if language is None:
+        language = model.detect_language(audio)
+    result = model.transcribe(audio, batch_size=batch_size,
+                              language=language)
+
+    offset = start / SAMPLE_RATE
+    for segment in result["segments"]:
+        ASR.shift_segment(segment, offset)
+
+    return result
+
 
 class ASR:
 
     def __init__(self, hf_token: str, cache_dir="data/.cache",
-                 transcript_dir="data/transcripts"):
+                 transcript_dir="data/transcripts", word_dir="data/words",
+                 speaker_dir="data/speakers"):
         """Initialise an ASR instance using WhisperX."""
         self.logger = logging.getLogger(__name__)
 
         # Hugging Face API token for speech diarization pipeline access
         self.hf_token = hf_token
 
-        # Setup raw transcript cache directory if needed
+        # Setup raw transcript cache directory if needed, keyed by audio
+        # content and model configuration per stage
         self.cache_dir = cache_dir
-        os.makedirs(self.cache_dir, exist_ok=True)
+        cache_size = float(os.getenv("ASR_CACHE_MB", "2048"))
+        self.cache = StageCache(self.cache_dir, max_size=cache_size)
 
         # Setup transcript output directory if needed
         self.transcript_dir = transcript_dir
         os.makedirs(self.transcript_dir, exist_ok=True)
 
+        # Setup columnar word-level transcript directory if needed
+        self.word_dir = word_dir
+        os.makedirs(self.word_dir, exist_ok=True)
+
+        # Decode recordings once and share the PCM between stages
+        self.audio_store = AudioStore()
+
         # Utilise GPU acceleration with CUDA if available
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
 
-    def transcribe_audio_file(self, file_path: str) -> str:
-        """Save JSONL transcript with speaker diarization of audio."""
-        # Use cache if available, else run transcription and cache result
-        cache_file = Path(self.cache_dir) / (Path(file_path).stem + ".json")
-        try:
-            with open(cache_file, 'r', encoding="utf-8") as file:
-                diarized = json.load(file)
-        except FileNotFoundError:
-            diarized = self.transcribe_audio_file_whisperx_raw(file_path)
-            with open(cache_file, "w", encoding="utf-8") as file:
-                json.dump(diarized, file)
-
-        # Format transcript
-        segments = (self.seg_to_jsonl(seg) for seg in diarized['segments'])
-        transcript = '\n'.join(segments)
+        # Keep models warm between meetings, evicting least recently used
+        # models once the memory budget is exceeded
+        memory_budget = float(os.getenv("ASR_MODEL_MEMORY_MB", "8192"))
+        self.models = ModelRegistry(memory_budget=memory_budget)
+
+        # Alignment models are loaded per language, so mixed-language
+        # meetings keep a few warm within the same memory budget
+        self.align_model_limit = max(1, int(os.getenv("ASR_ALIGN_MODELS",
+                                                      "3")))
+
+        # Process pool for splitting recordings across CPU cores, created
+        # on first use and kept so worker models stay warm
+        self.workers = int(os.getenv("ASR_WORKERS", "1"))
+        self._pool: ProcessPoolExecutor | None = None
+
+        # (model size, compute type) of Whisper models warm in the workers
+        self._pool_models: set[tuple[str, str]] = set()
+
+        # Transcription settings tuned for this host, see autotune.py
+        self.profile = ASRProfile(str(Path(self.cache_dir)
+                                      / "asr_profile.json"))
+
+        # Fit jobs to the memory available on the device
+        self.admission = AdmissionController()
+
+        # Known speakers of recurring meetings, for stable speaker labels.
+        # Kept outside the cache directory, whose entries are evicted
+        self.speakers = SpeakerStore(speaker_dir)
+
+        # Optionally drop non-speech audio before transcription
+        self.vad = os.getenv("ASR_VAD", "0") == "1"
+
+        # Stage name -> duration in seconds of the last transcription
+        self.last_timings: dict[str, float] = {}
+
+        # Language of the last transcription, detected or given
+        self.last_language: str | None = None
+
+    def transcribe_audio_file(self, file_path: str, draft=False,
+                              language: str | None = None,
+                              speaker_group: str | None = None) -> str:
+        """Save JSONL transcript with speaker diarization of audio.
+
+        In draft mode a small model transcribes the audio without alignment
+        or diarization, for a quick first transcript. A language hint skips
+        language detection, the language used is kept in last_language.
+        Speakers are labelled consistently across meetings of the same
+        speaker_group.
+        """
+        if draft:
+            return self.transcribe_audio_file_draft(file_path, language)
+
+        # A cached result needs no memory, so skips admission, which could
+        # also fall back on a smaller model and miss the cache
+        digest = self.cache.audio_digest(file_path)
+        fingerprint = self.stage_fingerprints(
+            language=language, speaker_group=speaker_group)["diarize"]
+        diarized = self.cache.get("diarize", digest, fingerprint)
+
+        if diarized is None:
+            # Transcribe very long recordings in windows to bound memory
+            audio = self.audio_store.load(file_path)
+            seconds = len(audio) / SAMPLE_RATE
+            windowed_min = float(os.getenv("ASR_WINDOWED_MIN_SECONDS",
+                                           "7200"))
+            windowed = seconds > windowed_min
+
+            # Shrink the job if it would not fit in available memory
+            model_size, batch_size, windowed = self.admission.admit(
+                self, file_path, seconds, windowed, language)
+
+            if windowed:
+                return self.transcribe_audio_file_windowed(
+                    file_path, model_size, batch_size, language,
+                    speaker_group)
+
+            diarized = self.transcribe_audio_file_whisperx_raw(
+                file_path, model_size, batch_size, language, speaker_group)
+        self.last_language = diarized.get("language", language)
 
         # Save transcript
         transcript_file = (Path(file_path).stem + "_transcript.jsonl")
         transcript_path = Path(self.transcript_dir) / transcript_file
-        with open(transcript_path, "w", encoding="utf-8") as jsonl_file:
-            jsonl_file.write(transcript)
+        with TranscriptWriter(transcript_path) as writer:
+            writer.write_all(diarized['segments'])
+
+        # Save word-level timings and speakers
+        word_path = Path(self.word_dir) / Path(file_path).stem
+        with WordStoreWriter(word_path) as word_writer:
+            word_writer.write(self.segment_words(diarized['segments']))
 
         return str(transcript_path)
 
-    def transcribe_audio_file_whisperx_raw(self, file_path: str):
-        """Create a transcript with speaker diarization of an audio file."""
-        # Load audio file
-        time = monotonic()
-        audio = whisperx.load_audio(file_path)
-        duration = monotonic() - time
-        self.logger.debug(f"Loaded '{file_path}' in {duration:.3f}s")
+    def transcribe_audio_file_draft(self, file_path: str,
+                                    language: str | None = None) -> str:
+        """Save a quick JSONL transcript of audio without speakers."""
+        model_size = os.getenv("WHISPER_DRAFT_MODEL", "base")
+        _, compute_type, _, _, language = \
+            self.transcribe_config(model_size, language=language)
+
+        digest = self.cache.audio_digest(file_path)
+        fingerprint = StageCache.fingerprint(model_size, compute_type,
+                                             language, self.vad)
+
+        def run_draft():
+            audio, speech_map = self.load_speech(file_path)
+            result = self.whisperx_transcribe(audio, model_size,
+                                              language=language)
+            if speech_map is not None:
+                speech_map.remap(result)
+            return result
 
-        # Base transcription
         time = monotonic()
-        base_transcription = self.whisperx_transcribe(audio)
+        draft = self.cached_stage("draft", digest, fingerprint,
+                                  run_draft)
         duration = monotonic() - time
-        self.logger.debug(f"Transcribed '{file_path}' in {duration:.3f}s")
+        self.logger.debug(f"Drafted '{file_path}' in {duration:.3f}s")
+        self.last_language = draft["language"]
 
-        # Transcript timestamp alignment
-        time = monotonic()
-        aligned = self.whisperx_align(audio, base_transcription)
-        duration = monotonic() - time
-        self.logger.debug(f"Aligned '{file_path}' in {duration:.3f}s")
+        # Save transcript
+        transcript_file = (Path(file_path).stem + "_draft.jsonl")
+        transcript_path = Path(self.transcript_dir) / transcript_file
+        with TranscriptWriter(transcript_path) as writer:
+            writer.write_all(draft['segments'])
+
+        return str(transcript_path)
 
-        # Speech diarization
+    def transcribe_audio_file_windowed(self, file_path: str,
+                                       model_size: str | None = None,
+                                       batch_size: int | None = None,
+                                       language: str | None = None,
+                                       speaker_group: str | None = None
+                                       ) -> str:
+        """Save JSONL transcript of a long recording in bounded memory.
+
+        Audio is read from the memory-mapped store in overlapping windows
+        split at quiet points. Each window is transcribed and aligned on its
+        own, timestamps are shifted back onto the recording and segments
+        and words are written out as soon as their window finishes.
+        Diarization runs once over the whole recording so speaker labels
+        stay consistent. Windowed results bypass the stage cache.
+
+        Without a language hint, the language detected in the first window
+        is used for the rest. With voice activity detection enabled, the
+        speech only audio is windowed and timestamps are mapped back onto
+        the recording as each window is written.
+        """
+        window = float(os.getenv("ASR_WINDOW_SECONDS", "1800"))
+        overlap = int(float(os.getenv("ASR_WINDOW_OVERLAP_SECONDS", "5"))
+                      * SAMPLE_RATE)
+
+        audio, speech_map = self.load_speech(file_path)
+        spans = AudioStore.split_at_silences(audio, window)
+
+        # Speech diarization over the whole recording
         time = monotonic()
-        diarized = self.whisperx_diarize(audio, aligned)
+        digest = self.cache.audio_digest(file_path)
+        diarize_segments = self.whisperx_diarize_segments(audio, digest,
+                                                          speaker_group)
         duration = monotonic() - time
         self.logger.debug(f"Diarized '{file_path}' in {duration:.3f}s")
 
-        return diarized
+        transcript_file = (Path(file_path).stem + "_transcript.jsonl")
+        transcript_path = Path(self.transcript_dir) / transcript_file
+        word_path = Path(self.word_dir) / Path(file_path).stem
+        with TranscriptWriter(transcript_path) as writer, \
+                WordStoreWriter(word_path) as word_writer:
+            for index, (start, end) in enumerate(spans):
+                time = monotonic()
+
+                # Extend the window into its neighbours so words spanning a
+                # split are heard in full by at least one window
+                window_start = max(0, start - overlap)
+                window_end = min(len(audio), end + overlap)
+                window_audio = audio[window_start:window_end]
+
+                base_transcription = self.whisperx_transcribe(
+                    window_audio, model_size, batch_size, language)
+                language = base_transcription["language"]
+                aligned = self.whisperx_align(window_audio,
+                                              base_transcription)
+
+                # Keep segments starting within this window's own span
+                offset = window_start / SAMPLE_RATE
+                span_start = start / SAMPLE_RATE
+                span_end = end / SAMPLE_RATE
+                segments = []
+                for segment in aligned["segments"]:
+                    self.shift_segment(segment, offset)
+                    if span_start <= segment["start"] < span_end:
+                        segments.append(segment)
+
+                # Assign speakers using diarization overlapping this span
+                window_diarization = diarize_segments[
+                    (diarize_segments["end"] > span_start - 1)
+                    & (diarize_segments["start"] < span_end + 1)
+                ]
+                diarized = whisperx.assign_word_speakers(
+                    window_diarization, {"segments": segments})
+                if speech_map is not None:
+                    speech_map.remap(diarized)
+
+                writer.write_all(diarized["segments"])
+                writer.flush()
+                word_writer.write(self.segment_words(diarized["segments"]))
+
+                duration = monotonic() - time
+                self.logger.debug(f"Transcribed window {index + 1}/"
+                                  f"{len(spans)} of '{file_path}' in "
+                                  f"{duration:.3f}s")
+
+        self.last_language = language
+        self.logger.debug(f"Model registry: {self.models.stats()}")
 
-    def seg_to_jsonl(self, segment) -> str:
-        """Format transcript segment as JSONL."""
-        # Extract components
-        text = segment["text"].strip()
-        start = segment["start"]
-        end = segment["end"]
+        return str(transcript_path)
 
-        # Label if speaker is identified or unknown
-        if "speaker" in segment:
-            speaker = segment["speaker"]
-        else:
-            speaker = "UNKNOWN_SPEAKER"
+    @staticmethod
+    def segment_words(segments: list[dict]):
+        """Yield the words of transcript segments in order."""
+        for segment in segments:
+            yield from segment.get("words", [])
+
+    @staticmethod
+    def shift_segment(segment: dict, offset: float) -> None:
+        """Shift segment and word timestamps by offset seconds in place."""
+        for item in [segment] + segment.get("words", []):
+            for key in ("start", "end"):
+                if key in item:
+                    item[key] += offset
+
+    def stage_fingerprints(self, model_size: str | None = None,
+                           language: str | None = None,
+                           speaker_group: str | None = None
+                           ) -> dict[str, str]:
+        """Fingerprint the configuration of each ASR stage.
+
+        Each stage includes the fingerprint of the stage before it, so a
+        change to one stage only invalidates that stage and later ones.
+        """
+        model_size, compute_type, _, _, language = \
+            self.transcribe_config(model_size, language=language)
+        transcribe = StageCache.fingerprint(model_size, compute_type,
+                                            language, self.vad)
+        align = StageCache.fingerprint(transcribe, os.getenv("ALIGN_MODEL"))
+        diarize = StageCache.fingerprint(
+            align, os.getenv("DIARIZE_MODEL", DEFAULT_DIARIZE_MODEL),
+            speaker_group)
+        return {"transcribe": transcribe, "align": align, "diarize": diarize}
+
+    def transcribe_audio_file_whisperx_raw(self, file_path: str,
+                                           model_size: str | None = None,
+                                           batch_size: int | None = None,
+                                           language: str | None = None,
+                                           speaker_group: str | None = None):
+        """Create a transcript with speaker diarization of an audio file.
+
+        Stages run as a dependency graph: diarization only needs the audio,
+        so it runs concurrently with transcription and alignment, and only
+        speaker assignment waits on both. Transcription and alignment are
+        cached by audio content and configuration, as is the final result.
+        Audio is memory-mapped from the audio store and shared by all
+        stages without copying. With voice activity detection enabled,
+        non-speech is dropped before any model runs and timestamps are
+        mapped back onto the recording at the end. Stage timings of the
+        run are kept in last_timings.
+        """
+        digest = self.cache.audio_digest(file_path)
+        fingerprints = self.stage_fingerprints(model_size, language,
+                                               speaker_group)
+
+        diarized = self.cache.get("diarize", digest, fingerprints["diarize"])
+        if diarized is not None:
+            return diarized
+
+        speech_map = None
+
+        def load():
+            nonlocal speech_map
+            audio, speech_map = self.load_speech(file_path)
+            return audio
+
+        def transcribe(audio):
+            workers = self.worker_count(len(audio) / SAMPLE_RATE)
+            if workers > 1:
+                return self.whisperx_transcribe_parallel(
+                    audio.filename, audio, workers, model_size, batch_size,
+                    language)
+            return self.whisperx_transcribe(audio, model_size, batch_size,
+                                            language)
+
+        def align(audio, base_transcription):
+            return self.cached_stage(
+                "align", digest, fingerprints["align"],
+                lambda: self.whisperx_align(audio, base_transcription))
+
+        graph = StageGraph()
+        graph.add("load", load)
+        graph.add("transcribe", lambda audio: self.cached_stage(
+            "transcribe", digest, fingerprints["transcribe"],
+            lambda: transcribe(audio)), "load")
+        graph.add("align", align, "load", "transcribe")
+        graph.add("diarize", lambda audio: self.whisperx_diarize_segments(
+            audio, digest, speaker_group), "load")
+        graph.add("assign", whisperx.assign_word_speakers,
+                  "diarize", "align")
+        diarized = graph.run()["assign"]
+
+        # Map timestamps from speech only audio back to the recording
+        if speech_map is not None:
+            speech_map.remap(diarized)
+
+        self.cache.put("diarize", digest, fingerprints["diarize"], diarized)
+
+        self.last_timings = graph.timings
+        timings = ", ".join(f"{stage} {duration:.3f}s"
+                            for stage, duration in graph.timings.items())
+        self.logger.info(f"Processed '{file_path}': {timings}")
+        self.logger.debug(f"Model registry: {self.models.stats()}")
 
-        # Format timing and create JSONL
-        timing = f'"start_time":{start},"end_time":{end}'
-        jsonl = f'{{"speaker":"{speaker}",{timing},"text":"{text}"}}'
+        return diarized
 
-        return jsonl
+    def load_speech(self, file_path: str):
+        """Return the audio of a recording and its speech map.
+
+        With voice activity detection enabled, non-speech is dropped so
+        later stages only process speech, and the map places timestamps of
+        the speech only audio back onto the recording. Otherwise the map
+        is None.
+        """
+        audio = self.audio_store.load(file_path)
+        if not self.vad:
+            return audio, None
+
+        speech_map = SpeechMap.detect(audio)
+        speech_path = self.audio_store.pcm_path(file_path)
+        speech_path = speech_path.with_name(speech_path.name + ".speech")
+        removed = speech_map.removed_seconds
+        total = len(audio) / SAMPLE_RATE
+        self.logger.info(f"VAD removed {removed:.1f}s of {total:.1f}s "
+                         f"from '{file_path}'")
+        return speech_map.condense(audio, speech_path), speech_map
+
+    def cached_stage(self, stage: str, digest: str, fingerprint: str,
+                     run):
+        """Return a cached stage output, running and caching it on a miss."""
+        result = self.cache.get(stage, digest, fingerprint)
+        if result is None:
+            result = run()
+            self.cache.put(stage, digest, fingerprint, result)
+        return result
 
-    def whisperx_transcribe(self, audio):
-        """Run basic transcription of audio."""
-        model_size = os.getenv("WHISPER_MODEL", "distil-large-v3")
+    @staticmethod
+    def estimate_model_size(model_size: str, compute_type: str) -> float:
+        """Estimate the resident size (in MB) of a Whisper model."""
+        size = MODEL_SIZES.get(model_size.removeprefix("openai/whisper-"),
+                               MODEL_SIZES["large-v3"])
+        if compute_type == "float16":
+            size /= 2
+        elif compute_type.startswith("int8"):
+            size /= 4
+        return size
+
+    def pending_model_size(self, model_size: str, compute_type: str,
+                           language: str | None = None,
+                           workers: int = 1) -> float:
+        """Estimate the size (in MB) of models a transcription would load.
+
+        With several workers, each worker process loads its own Whisper
+        model. Without a language, the alignment model counts as resident
+        if one is loaded for any language.
+        """
+        size = 0.0
+        if workers > 1:
+            if (model_size, compute_type) not in self._pool_models:
+                size += workers * self.estimate_model_size(model_size,
+                                                           compute_type)
+        elif self.whisper_model_key(model_size, compute_type) \
+                not in self.models:
+            size += self.estimate_model_size(model_size, compute_type)
+
+        if language is not None:
+            aligned = self.align_model_key(language) in self.models
+        else:
+            aligned = any(key[0] == "align" for key in self.models.keys())
+        if not aligned:
+            size += ALIGN_MODEL_SIZE
+
+        if not any(key[0] == "diarize" for key in self.models.keys()):
+            size += DIARIZE_MODEL_SIZE
+        return size
+
+    def whisper_model_key(self, model_size: str, compute_type: str) -> tuple:
+        """Return the model registry key of a WhisperX model."""
+        return ("whisper", model_size, compute_type, self.device)
+
+    def load_whisper_model(self, model_size: str, compute_type: str,
+                           threads: int | None = None):
+        """Return a warm WhisperX model, loading it on first use.
+
+        Models are loaded without a language, which is given per
+        transcription, so one model serves every language.
+        """
+        key = self.whisper_model_key(model_size, compute_type)
+
+        def load():
+            kwargs = {"compute_type": compute_type}
+            if threads is not None:
+                kwargs["threads"] = threads
+            return whisperx.load_model(model_size, self.device, **kwargs)
+
+        size = self.estimate_model_size(model_size, compute_type)
+        return self.models.get(key, load, size)
+
+    def align_model_key(self, language: str) -> tuple:
+        """Return the model registry key of an alignment model."""
+        return ("align", os.getenv("ALIGN_MODEL"), None, self.device,
+                language)
+
+    def load_align_model(self, language: str):
+        """Return a warm alignment model and metadata for a language."""
+        key = self.align_model_key(language)
+
+        def load():
+            return whisperx.load_align_model(
+                language_code=language, device=self.device,
+                model_name=os.getenv("ALIGN_MODEL"))
+
+        model = self.models.get(key, load, ALIGN_MODEL_SIZE)
+
+        # Keep at most ASR_ALIGN_MODELS languages warm
+        align_keys = [k for k in self.models.keys() if k[0] == "align"]
+        for old_key in align_keys[:-self.align_model_limit]:
+            self.models.evict(old_key)
+
+        return model
+
+    def load_diarize_model(self):
+        """Return a warm speech diarization pipeline."""
+        model_name = os.getenv("DIARIZE_MODEL", DEFAULT_DIARIZE_MODEL)
+        key = ("diarize", model_name, None, self.device, None)
+
+        def load():
+            return whisperx.DiarizationPipeline(model_name=model_name,
+                                                use_auth_token=self.hf_token,
+                                                device=self.device)
+
+        return self.models.get(key, load, DIARIZE_MODEL_SIZE)
+
+    def transcribe_config(self, model_size: str | None = None,
+                          batch_size: int | None = None,
+                          language: str | None = None
+                          ) -> tuple[str, str, int, int | None, str | None]:
+        """Return model size, compute type, batch size, threads and
+        language for transcription on this device.
+
+        Settings tuned for this host and model take precedence over the
+        defaults for the device, a given batch size over both. A given
+        language takes precedence over WHISPER_LANGUAGE, and None leaves
+        the language to be detected.
+        """
+        requested_batch_size = batch_size
+        if model_size is None:
+            model_size = os.getenv("WHISPER_MODEL", "distil-large-v3")
+        language = language or os.getenv("WHISPER_LANGUAGE") or None
 
         if self.device == "cuda":
             # Setup for CUDA acceleration
             batch_size = 6
             compute_type = "float16"
-            model = whisperx.load_model(model_size, self.device,
-                                        compute_type=compute_type)
+            threads = None
         else:
             # Setup for CPU inference
-            threads = os.cpu_count()
             batch_size = 8
             compute_type = "int8"
+            threads = os.cpu_count()
+
+        tuned = self.profile.get(self.device, model_size)
+        if tuned is not None:
+            batch_size = tuned["batch_size"]
+            compute_type = tuned["compute_type"]
+            threads = tuned["threads"]
+
+        if requested_batch_size is not None:
+            batch_size = requested_batch_size
+
+        return model_size, compute_type, batch_size, threads, language
+
+    def whisperx_transcribe(self, audio, model_size: str | None = None,
+                            batch_size: int | None = None,
+                            language: str | None = None):
+        """Run basic transcription of audio."""
+        model_size, compute_type, batch_size, threads, language = \
+            self.transcribe_config(model_size, batch_size, language)
+
+        if threads is not None:
             torch.set_num_threads(threads)
-            model = whisperx.load_model(model_size, self.device,
-                                        compute_type=compute_type,
-                                        threads=threads)
+        model = self.load_whisper_model(model_size, compute_type, threads)
 
-        # Run transcription inference
-        result = model.transcribe(audio, batch_size=batch_size)
+        # A warm model keeps the language of its first transcription unless
+        # given one, so detect the language of each recording without a hint
+        if language is None:
+            language = model.detect_language(audio)
 
-        # Cleanup model and free memory
-        del model
-        gc.collect()
-        torch.cuda.empty_cache()
+        # Run transcription inference
+        result = model.transcribe(audio, batch_size=batch_size,
+                                  language=language)
 
         return result
 
+    def worker_count(self, seconds: float) -> int:
+        """Return the number of worker processes to transcribe seconds of
+        audio with.
+
+        Parallel transcription is only used for CPU inference, and never
+        with spans shorter than MIN_WORKER_SPAN seconds.
+        """
+        if self.device != "cpu":
+            return 1
+        spans = int(seconds // MIN_WORKER_SPAN)
+        return max(1, min(self.workers, spans))
+
+    def get_pool(self) -> ProcessPoolExecutor:
+        """Return the transcription process pool, creating it if needed."""
+        if self._pool is None:
+            threads = max(1, os.cpu_count() // self.workers)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_transcribe_worker,
+                initargs=(threads,))
+        return self._pool
+
+    def whisperx_transcribe_parallel(self, pcm_path: str, audio,
+                                     workers: int,
+                                     model_size: str | None = None,
+                                     batch_size: int | None = None,
+                                     language: str | None = None):
+        """Run basic transcription of audio split across worker processes.
+
+        The recording is split at quiet points into one span per worker,
+        each worker transcribes its span with an even share of CPU threads
+        and the results are merged in time order.
+        """
+        model_size, compute_type, batch_size, _, language = \
+            self.transcribe_config(model_size, batch_size, language)
+        threads = max(1, os.cpu_count() // self.workers)
+
+        span = len(audio) / SAMPLE_RATE / workers
+        spans = AudioStore.split_at_silences(audio, span)
+
+        pool = self.get_pool()
+        try:
+            futures = [
+                pool.submit(_transcribe_span, pcm_path, start, end,
+                            model_size, compute_type, batch_size, threads,
+                            language)
+                for start, end in spans
+            ]
+            results = [future.result() for future in futures]
+        except BrokenProcessPool:
+            # A broken pool fails every later call, replace it next time
+            # and transcribe this recording in process
+            self.logger.error("Transcription worker pool broke, "
+                              "transcribing in process")
+            pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._pool_models.clear()
+            return self.whisperx_transcribe(audio, model_size, batch_size,
+                                            language)
+
+        self._pool_models.add((model_size, compute_type))
+
+        segments = [segment for result in results
+                    for segment in result["segments"]]
+        segments.sort(key=lambda segment: segment["start"])
+        languages = Counter(result["language"] for result in results)
+
+        self.logger.debug(f"Transcribed {len(spans)} spans in parallel")
+
+        return {"segments": segments,
+                "language": languages.most_common(1)[0][0]}
+
     def whisperx_align(self, audio, transcription):
         """Align transcription timestamps to audio."""
         # Setup model based on device and transcript language
-        model, metadata = whisperx.load_align_model(
-            language_code=transcription["language"],
-            device=self.device)
+        model, metadata = self.load_align_model(transcription["language"])
 
         # Run alignment inference
         result = whisperx.align(
             transcription["segments"], model, metadata, audio, self.device)
-
-        # Cleanup model and free memory
-        del model
-        gc.collect()
-        torch.cuda.empty_cache()
+        result["language"] = transcription["language"]
 
         return result
 
-    def whisperx_diarize(self, audio, aligned):
-        # Setup diarization pipeline
-        model = whisperx.DiarizationPipeline(
-            use_auth_token=self.hf_token,
-            device=self.device)
-
-        # Run diarization inference
-        diarize_segments = model(audio)
-
-        # Assign speakers to transcript segments
-        result = whisperx.assign_word_speakers(diarize_segments, aligned)
-
-        # Cleanup model and free memory
-        del model
-        gc.collect()
-        torch.cuda.empty_cache()
-
-        return result
+    def whisperx_diarize_segments(self, audio, digest: str | None = None,
+                                  speaker_group: str | None = None):
+        """Find speaker turns in audio.
+
+        Speaker turns and embeddings are cached per recording when its
+        digest is given. With a speaker group, speakers are relabelled to
+        match the known speakers of the group, and newly diarized
+        embeddings update the group.
+        """
+        def diarize():
+            # Setup diarization pipeline. The WhisperX wrapper drops
+            # speaker embeddings, so the pyannote pipeline it wraps is run
+            # directly
+            pipeline = self.load_diarize_model().model
+            audio_data = {"waveform": torch.from_numpy(audio[None, :]),
+                          "sample_rate": SAMPLE_RATE}
+
+            # Run diarization inference, keeping speaker embeddings if the
+            # pipeline supports it
+            parameters = inspect.signature(pipeline.apply).parameters
+            if "return_embeddings" in parameters:
+                turns, embeddings = pipeline(audio_data,
+                                             return_embeddings=True)
+            else:
+                turns, embeddings = pipeline(audio_data), None
+
+            # Embeddings are ordered as the speaker labels
+            speakers = {}
+            if embeddings is not None:
+                speakers = {
+                    speaker: np.asarray(embedding).tolist()
+                    for speaker, embedding in zip(turns.labels(), embeddings)
+                }
+            return {
+                "segments": [{"start": segment.start, "end": segment.end,
+                              "speaker": speaker}
+                             for segment, _, speaker
+                             in turns.itertracks(yield_label=True)],
+                "embeddings": speakers,
+            }
+
+        # Condensed speech only audio is cached apart from the recording
+        fingerprint = StageCache.fingerprint(
+            os.getenv("DIARIZE_MODEL", DEFAULT_DIARIZE_MODEL), len(audio))
+        result = None
+        if digest is not None:
+            result = self.cache.get("turns", digest, fingerprint)
+        fresh = result is None
+        if fresh:
+            result = diarize()
+            if digest is not None:
+                self.cache.put("turns", digest, fingerprint, result)
+
+        segments = pd.DataFrame(result["segments"],
+                                columns=["start", "end", "speaker"])
+        if speaker_group is not None:
+            if result["embeddings"]:
+                mapping = self.speakers.match(
+                    speaker_group, result["embeddings"], update=fresh)
+                segments["speaker"] = segments["speaker"].replace(mapping)
+            else:
+                self.logger.warning(
+                    f"Diarization gave no speaker embeddings, speakers of "
+                    f"'{speaker_group}' are not matched to known speakers")
+
+        return segments
@@ -1,9 +1,11 @@
 import asyncio
+import hashlib
 import os
 from typing import Any, List, Tuple, Dict
 import json
 import logging
 import sqlalchemy
+import uuid
 from time import monotonic
 
 from ..access import select_many_from_table, select_from_table
@@ -22,6 +24,10 @@ from sqlalchemy import cast, Integer
 import datetime
 
 
+# Prefix of documents embedded with nomic-embed-text
+DOCUMENT_PREFIX = "search_document: "
+
+
 class KeyPoints(BaseModel):
     """
     key_points: list of key points mentioned in text
@@ -59,6 +65,12 @@ class RAG:
             embed_model = "nomic-embed-text"
             self.embeddings = OllamaEmbeddings(model=embed_model)
 
+        self.vector_store = self.create_vector_store(
+            os.environ.get("VECTOR_STORE_NAME", "deco3801")
+        )
+
+    def create_vector_store(self, collection_name: str) -> "DB_MeetingChunk":
+        """Open a collection of meeting chunks, creating it if needed."""
         login = f"{os.getenv('DB_USER')}:{os.getenv('DB_PASSWORD')}"
         host = os.getenv('HOSTNAME')
         port = os.getenv('PORT')
@@ -66,9 +78,9 @@ class RAG:
         connection = f"postgresql+psycopg://{login}@{host}:{port}/{db}"
         self.logger.debug(connection)
 
-        self.vector_store = DB_MeetingChunk(
+        return DB_MeetingChunk(
             embeddings=self.embeddings,
-            collection_name=os.environ.get("VECTOR_STORE_NAME", "deco3801"),
+            collection_name=collection_name,
             connection=connection,
             use_jsonb=True,
         )
@@ -95,7 +107,8 @@ class RAG:
 
     def jsonl_to_txt(self, jsonl: str) -> str:
         """Convert JSONL transcript to basic transcript with speaker labels."""
-        segments = (json.loads(seg) for seg in jsonl.split('\n'))
+        segments = (json.loads(seg) for seg in jsonl.split('\n')
+                    if seg.strip())
         transcript = "\n".join(self.seg_to_txt(segment)
                                for segment in segments)
         return transcript
@@ -184,13 +197,66 @@ class RAG:
             'action_items': self.action_item_extraction(transcript),
         }
 
-    def embed_meeting(self, meeting, chunks: List[Document]):
+    @staticmethod
+    def chunk_span(chunk: Document) -> tuple:
+        """Identify a chunk by its position and content."""
+        return (chunk.metadata["chunk_id"], chunk.metadata["start_time"],
+                chunk.metadata["end_time"], chunk.page_content)
+
+    @staticmethod
+    def chunk_uuid(chunk: Document, collection: str) -> str:
+        """Return the id of a meeting chunk in a collection, derived from
+        its meeting, position and content, so the same chunk always has the
+        same id.
+
+        Ids are unique across collections, and kept when a collection is
+        renamed, as they are namespaced by the collection's uuid.
+        """
+        span = json.dumps(RAG.chunk_span(chunk), ensure_ascii=False)
+        digest = hashlib.sha256(span.encode("utf-8")).hexdigest()
+        return str(uuid.uuid5(uuid.UUID(collection),
+                              f"{chunk.metadata['meeting_id']}:"
+                              f"{chunk.metadata['chunk_id']}:{digest}"))
+
+    def prepare_chunks(self, meeting_id: int, chunks: List[Document],
+                       collection: str) -> List[Document]:
+        """Prepare chunks of a meeting to be embedded into a collection."""
         for chunk in chunks:
+            # Chunks read back from a collection may carry a prefix
+            content = chunk.page_content.removeprefix(DOCUMENT_PREFIX)
             if isinstance(self.embeddings, OllamaEmbeddings):
-                chunk.page_content = "search_document: " + chunk.page_content
-            chunk.metadata["meeting_id"] = meeting.id
+                content = DOCUMENT_PREFIX + content
+            chunk.page_content = content
+            chunk.metadata["meeting_id"] = meeting_id
+            chunk.id = self.chunk_uuid(chunk, collection)
+        return chunks
 
-        self.vector_store.add_documents(chunks)
+    def embed_meeting(self, meeting, chunks: List[Document]):
+        """Embed meeting chunks, replacing chunks from earlier transcripts.
+
+        Chunk ids are deterministic, so stored chunks identical to a new
+        chunk are kept as is and only spans that changed since a previous
+        (e.g. draft) transcript are embedded. Chunks are upserted, so
+        embedding a meeting again never duplicates them.
+        """
+        collection = self.vector_store.collection_uuid()
+        chunks = self.prepare_chunks(meeting.id, chunks, collection)
+
+        existing = set(self.vector_store.get_meeting_chunk_ids(meeting.id))
+        new_chunks = [chunk for chunk in chunks if chunk.id not in existing]
+        kept = set(chunk.id for chunk in chunks)
+        stale_ids = sorted(existing - kept)
+
+        # Add new chunks first, so the meeting stays searchable by its
+        # earlier chunks if embedding fails
+        if new_chunks:
+            self.vector_store.add_documents(
+                new_chunks, ids=[chunk.id for chunk in new_chunks]
+            )
+        if stale_ids:
+            self.vector_store.delete(ids=stale_ids)
+        self.logger.debug(f"Embedded {len(new_chunks)} chunks, removed "
+                          f"{len(stale_ids)} of meeting {meeting.id}")
 
     def format_docs(self, input):
         docs = input['docs']
@@ -328,6 +394,48 @@ class DB_MeetingChunk(PGVector):
         ]
         return docs
 
+    def get_meeting_chunks(self, meeting_id: int) -> List[Document]:
+        """Return all stored chunks of a meeting."""
+        with self._make_sync_session() as session:  # type: ignore[arg-type]
+            collection = self.get_collection(session)
+            filter = {"meeting_id": {"$eq": meeting_id}}
+            filter_by = [self.EmbeddingStore.collection_id == collection.uuid,
+                         self._create_filter_clause(filter)]
+            results: List[Any] = (
+                session.query(self.EmbeddingStore)
+                .filter(*filter_by)
+                .all()
+            )
+
+        return [
+            Document(
+                id=str(result.id),
+                page_content=result.document,
+                metadata=result.cmetadata,
+            )
+            for result in results
+        ]
+
+    def collection_uuid(self) -> str:
+        """Return the uuid of the collection, which survives renames."""
+        with self._make_sync_session() as session:  # type: ignore[arg-type]
+            return str(self.get_collection(session).uuid)
+
+    def get_meeting_chunk_ids(self, meeting_id: int) -> List[str]:
+        """Return the ids of all stored chunks of a meeting."""
+        with self._make_sync_session() as session:  # type: ignore[arg-type]
+            collection = self.get_collection(session)
+            filter = {"meeting_id": {"$eq": meeting_id}}
+            filter_by = [self.EmbeddingStore.collection_id == collection.uuid,
+                         self._create_filter_clause(filter)]
+            results: List[Any] = (
+                session.query(self.EmbeddingStore.id)
+                .filter(*filter_by)
+                .all()
+            )
+
+        return [str(result.id) for result in results]
+
     def get_content_with_context(self, chunk, n=2) -> str:
         # n is number of chunks to get, if n=2 it will return the original
         # with the 2 chunks above and 2 chunks below
@@ -0,0 +1,161 @@
+import logging
+import os
+from time import monotonic, sleep
+
+import torch
+
+from .audio_store import SAMPLE_RATE
+
+
+# Rough working memory (as a fraction of model size) per item in a batch
+ACTIVATION_FRACTION = 0.1
+
+# Copies of the decoded audio held at once across the pipeline stages
+AUDIO_COPIES = 3
+
+
+class AdmissionController:
+
+    def __init__(self, reserve: float | None = None,
+                 wait_timeout: float | None = None,
+                 poll_interval: float = 5.0):
+        """Initialise admission control of ASR jobs by available memory.
+
+        reserve is memory (in MB) left free for other processes sharing the
+        host, such as a local LLM. Jobs that do not fit wait up to
+        wait_timeout seconds for memory to be freed.
+        """
+        self.logger = logging.getLogger(__name__)
+        if reserve is None:
+            reserve = float(os.getenv("ASR_MEMORY_RESERVE_MB", "1024"))
+        if wait_timeout is None:
+            wait_timeout = float(os.getenv("ASR_ADMISSION_WAIT_SECONDS",
+                                           "300"))
+        self.reserve = reserve
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+
+        # Smaller models to fall back on, in order of preference
+        fallback = os.getenv("ASR_FALLBACK_MODELS", "small,base")
+        self.fallback_models = [m.strip() for m in fallback.split(",")
+                                if m.strip()]
+
+    @staticmethod
+    def available_memory(device: str) -> float | None:
+        """Return free memory (in MB) on a device, None if unknown."""
+        if device == "cuda":
+            free, _ = torch.cuda.mem_get_info()
+            return free / 2**20
+
+        # MemAvailable counts reclaimable page cache, unlike free pages
+        try:
+            with open("/proc/meminfo", "r", encoding="utf-8") as file:
+                for line in file:
+                    if line.startswith("MemAvailable:"):
+                        return int(line.split()[1]) / 2**10
+        except OSError:
+            pass
+
+        try:
+            pages = os.sysconf("SC_AVPHYS_PAGES")
+            page_size = os.sysconf("SC_PAGE_SIZE")
+            return pages * page_size / 2**20
+        except (AttributeError, ValueError, OSError):
+            return None
+
+    @staticmethod
+    def estimate(asr, model_size: str, batch_size: int, seconds: float,
+                 language: str | None = None, workers: int = 1) -> float:
+        """Estimate memory (in MB) needed to transcribe seconds of audio.
+
+        Covers models not already resident, per-batch activations and
+        copies of the decoded audio. Each of several workers loads its
+        own model and runs its own batches.
+        """
+        compute_type = asr.transcribe_config(model_size, batch_size)[1]
+        model = asr.estimate_model_size(model_size, compute_type)
+        activations = workers * batch_size * model * ACTIVATION_FRACTION
+        audio = seconds * SAMPLE_RATE * 4 * AUDIO_COPIES / 2**20
+        return asr.pending_model_size(model_size, compute_type, language,
+                                      workers) + activations + audio
+
+    def admit(self, asr, file_path: str, seconds: float, windowed: bool,
+              language: str | None = None) -> tuple[str, int, bool]:
+        """Return model size, batch size and whether to transcribe in
+        windows, so a job fits in available memory.
+
+        In order, batches are made smaller, the recording is split into
+        windows, the job waits for memory to be freed and smaller models
+        are tried. A job that still does not fit runs anyway.
+        """
+        model_size, _, batch_size, _, _ = asr.transcribe_config()
+        window = float(os.getenv("ASR_WINDOW_SECONDS", "1800"))
+
+        def shortfall() -> float | None:
+            available = self.available_memory(asr.device)
+            if available is None:
+                return None
+            # Windows are transcribed in process, whole recordings may be
+            # split across worker processes on CPU
+            if windowed:
+                job_seconds, workers = min(seconds, window), 1
+            else:
+                job_seconds, workers = seconds, asr.worker_count(seconds)
+            needed = self.estimate(asr, model_size, batch_size, job_seconds,
+                                   language, workers)
+            return needed - (available - self.reserve)
+
+        missing = shortfall()
+        if missing is None:
+            self.logger.debug("Available memory unknown, admitting "
+                              f"'{file_path}' as is")
+            return model_size, batch_size, windowed
+
+        # Smaller batches need less working memory
+        while missing > 0 and batch_size > 1:
+            batch_size //= 2
+            self.logger.info(f"Reducing batch size to {batch_size} for "
+                             f"'{file_path}', {missing:.0f}MB short")
+            missing = shortfall()
+
+        # Windows bound the audio held in memory at once
+        if missing > 0 and not windowed and seconds > window:
+            windowed = True
+            self.logger.info(f"Transcribing '{file_path}' in windows, "
+                             f"{missing:.0f}MB short")
+            missing = shortfall()
+
+        # Other jobs on the host may release memory soon
+        deadline = monotonic() + self.wait_timeout
+        if missing > 0 and self.wait_timeout > 0:
+            self.logger.info(f"Waiting up to {self.wait_timeout:.0f}s for "
+                             f"{missing:.0f}MB to transcribe '{file_path}'")
+            while missing > 0 and monotonic() < deadline:
+                sleep(self.poll_interval)
+                missing = shortfall()
+
+        # Settle for a smaller model
+        for fallback in self.fallback_models:
+            if missing <= 0:
+                break
+            compute_type = asr.transcribe_config(fallback)[1]
+            current_type = asr.transcribe_config(model_size)[1]
+            if asr.estimate_model_size(fallback, compute_type) \
+                    >= asr.estimate_model_size(model_size, current_type):
+                continue
+            self.logger.info(f"Falling back to model {fallback} for "
+                             f"'{file_path}', {missing:.0f}MB short")
+            model_size = fallback
+            batch_size = min(batch_size,
+                             asr.transcribe_config(fallback)[2])
+            missing = shortfall()
+
+        if missing > 0:
+            self.logger.warning(f"Transcribing '{file_path}' with model "
+                                f"{model_size} and batch size {batch_size} "
+                                f"despite being {missing:.0f}MB short")
+        else:
+            self.logger.debug(f"Admitted '{file_path}' with model "
+                              f"{model_size} and batch size {batch_size}")
+
+        return model_size, batch_size, windowed
@@ -0,0 +1,100 @@
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+
+
+class StageCache:
+
+    def __init__(self, cache_dir: str, max_size: float | None = None):
+        """Initialise a content-addressed cache of ASR stage outputs.
+
+        Entries are stored as cache_dir/<stage>/<audio digest>-<fingerprint>
+        JSON files. max_size is the total size (in MB) kept on disk before
+        the least recently used entries are evicted, None is unbounded.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        # (path, size, mtime) -> digest, avoids rehashing unchanged files
+        self._digests: dict[tuple[str, int, float], str] = {}
+
+    def audio_digest(self, file_path: str) -> str:
+        """Return the SHA-256 digest of an audio file's contents."""
+        stat = os.stat(file_path)
+        key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime)
+        if key in self._digests:
+            return self._digests[key]
+
+        sha = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            while block := file.read(2**20):
+                sha.update(block)
+        digest = sha.hexdigest()
+
+        self._digests[key] = digest
+        return digest
+
+    @staticmethod
+    def fingerprint(*parts) -> str:
+        """Return a short stable hash of configuration values."""
+        encoded = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+    def path(self, stage: str, digest: str, fingerprint: str) -> Path:
+        """Return the path of the cache entry for a stage."""
+        return self.cache_dir / stage / f"{digest}-{fingerprint}.json"
+
+    def get(self, stage: str, digest: str, fingerprint: str) -> dict | None:
+        """Return a cached stage output, or None if not cached."""
+        path = self.path(stage, digest, fingerprint)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.logger.debug(f"Cache miss for {stage} {digest[:12]}")
+            return None
+
+        # Refresh modification time so eviction is least recently used
+        os.utime(path)
+        self.logger.debug(f"Cache hit for {stage} {digest[:12]}")
+        return data
+
+    def put(self, stage: str, digest: str, fingerprint: str,
+            data: dict) -> None:
+        """Store a stage output, evicting old entries if over size."""
+        path = self.path(stage, digest, fingerprint)
+        os.makedirs(path.parent, exist_ok=True)
+
+        # Write to a temporary file first so readers never see partial JSON
+        temp_path = path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+        os.replace(temp_path, path)
+
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until within max size."""
+        if self.max_size is None:
+            return
+
+        entries = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        limit = self.max_size * 2**20
+        for _, size, path in sorted(entries):
+            if total <= limit:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            self.logger.debug(f"Evicted cache entry {path.name}")
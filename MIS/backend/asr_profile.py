@@ -0,0 +1,45 @@
+import json
+import logging
+import os
+import platform
+from pathlib import Path
+
+import torch
+
+
+class ASRProfile:
+
+    def __init__(self, path: str = "data/.cache/asr_profile.json"):
+        """Initialise tuned transcription settings stored at path."""
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path)
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                self.profiles = json.load(file)
+        except FileNotFoundError:
+            self.profiles = {}
+        except json.JSONDecodeError:
+            self.logger.warning(f"Ignoring invalid ASR profile {self.path}")
+            self.profiles = {}
+
+    @staticmethod
+    def host_key(device: str, model_size: str) -> str:
+        """Identify a host, device and model combination."""
+        if device == "cuda":
+            device_name = torch.cuda.get_device_name(0)
+        else:
+            device_name = f"{platform.processor() or 'cpu'} x{os.cpu_count()}"
+        return f"{platform.node()}/{device_name}/{model_size}"
+
+    def get(self, device: str, model_size: str) -> dict | None:
+        """Return tuned settings for this host and model, if any."""
+        return self.profiles.get(self.host_key(device, model_size))
+
+    def set(self, device: str, model_size: str, settings: dict) -> None:
+        """Store tuned settings for this host and model."""
+        self.profiles[self.host_key(device, model_size)] = settings
+        os.makedirs(self.path.parent, exist_ok=True)
+        temp_path = self.path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.profiles, file, indent=2)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,131 @@
+import logging
+import os
+import subprocess
+from pathlib import Path
+
+import numpy as np
+
+
+# WhisperX, wav2vec2 alignment and pyannote all operate on 16kHz mono audio
+SAMPLE_RATE = 16000
+
+
+class AudioStore:
+
+    def __init__(self):
+        """Initialise a store of decoded PCM audio kept next to recordings."""
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def pcm_path(file_path: str) -> Path:
+        """Return the path of the decoded PCM file for a recording."""
+        path = Path(file_path)
+        return path.with_name(path.name + ".pcm")
+
+    def load(self, file_path: str) -> np.ndarray:
+        """Return 16kHz mono float32 audio of a recording.
+
+        The recording is decoded once with FFmpeg and persisted as raw PCM,
+        later loads memory-map that file instead of decoding again. The map
+        is copy-on-write so consumers can wrap it without copying.
+        """
+        pcm_path = self.pcm_path(file_path)
+        if not self.is_decoded(file_path):
+            self.decode(file_path, pcm_path)
+
+        # Zero-length files cannot be memory-mapped
+        if pcm_path.stat().st_size == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        return np.memmap(pcm_path, dtype=np.float32, mode="c")
+
+    def is_decoded(self, file_path: str) -> bool:
+        """Check if an up to date PCM file exists for a recording."""
+        pcm_path = self.pcm_path(file_path)
+        try:
+            pcm_mtime = pcm_path.stat().st_mtime
+        except FileNotFoundError:
+            return False
+        return pcm_mtime >= os.stat(file_path).st_mtime
+
+    def decode(self, file_path: str, pcm_path: Path) -> None:
+        """Decode a recording to raw 16kHz mono float32 PCM."""
+        temp_path = pcm_path.with_name(pcm_path.name + ".tmp")
+        cmd = [
+            "ffmpeg", "-nostdin", "-y",
+            "-threads", "0",
+            "-i", str(file_path),
+            "-f", "f32le",
+            "-ac", "1",
+            "-acodec", "pcm_f32le",
+            "-ar", str(SAMPLE_RATE),
+            str(temp_path),
+        ]
+        try:
+            subprocess.run(cmd, capture_output=True, check=True)
+        except subprocess.CalledProcessError as e:
+            temp_path.unlink(missing_ok=True)
+            raise RuntimeError(
+                f"Failed to decode audio: {e.stderr.decode()}"
+            ) from e
+
+        # Rename into place so a crash never leaves a truncated PCM file
+        os.replace(temp_path, pcm_path)
+        self.logger.debug(f"Decoded '{file_path}' to '{pcm_path}'")
+
+    @staticmethod
+    def probe_duration(file_path: str) -> float | None:
+        """Return the duration (in seconds) of an audio file, None if it
+        cannot be read."""
+        cmd = [
+            "ffprobe", "-v", "error",
+            "-show_entries", "format=duration",
+            "-of", "default=noprint_wrappers=1:nokey=1",
+            str(file_path),
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, check=True)
+            return float(result.stdout.decode().strip())
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            return None
+
+    @staticmethod
+    def quietest_point(audio: np.ndarray, start: int, end: int,
+                       frame: int = SAMPLE_RATE // 50) -> int:
+        """Return the sample index of the quietest frame in a range.
+
+        Only the requested range is read, so this is cheap on memory-mapped
+        audio regardless of recording length.
+        """
+        region = np.asarray(audio[start:end], dtype=np.float32)
+        frames = len(region) // frame
+        if frames == 0:
+            return (start + end) // 2
+
+        energy = np.square(region[:frames * frame].reshape(frames, frame))
+        quietest = int(np.argmin(energy.mean(axis=1)))
+        return start + quietest * frame + frame // 2
+
+    @classmethod
+    def split_at_silences(cls, audio: np.ndarray, span: float,
+                          search: float = 30.0) -> list[tuple[int, int]]:
+        """Split audio into spans of about span seconds at quiet points.
+
+        Each split is placed at the quietest frame within search seconds of
+        the target split, returns (start, end) sample index pairs.
+        """
+        span_samples = int(span * SAMPLE_RATE)
+        search_samples = int(search * SAMPLE_RATE)
+        length = len(audio)
+
+        spans = []
+        start = 0
+        while length - start > span_samples + search_samples:
+            target = start + span_samples
+            cut = cls.quietest_point(audio, target - search_samples,
+                                     target + search_samples)
+            spans.append((start, cut))
+            start = cut
+        spans.append((start, length))
+
+        return spans
@@ -0,0 +1,111 @@
+import argparse
+import itertools
+import logging
+import os
+from time import monotonic
+
+from dotenv import load_dotenv
+
+from .ASR import ASR
+from .audio_store import SAMPLE_RATE
+
+
+def candidates(device: str) -> list[tuple[int, str, int | None]]:
+    """Return (batch size, compute type, threads) combinations to try."""
+    batch_sizes = [4, 8, 16]
+    if device == "cuda":
+        return list(itertools.product(batch_sizes,
+                                      ["float16", "int8_float16"],
+                                      [None]))
+
+    cpus = os.cpu_count()
+    threads = sorted({max(1, cpus // 4), max(1, cpus // 2), cpus})
+    return list(itertools.product(batch_sizes, ["int8", "float32"],
+                                  threads))
+
+
+def autotune(asr: ASR, clip_path: str, seconds: float = 60.0) -> list[dict]:
+    """Benchmark transcription settings on the start of a clip.
+
+    Each combination is timed after its model is loaded, so results only
+    reflect inference. Returns results sorted fastest first, the fastest
+    is saved to the ASR profile for this host and model.
+    """
+    logger = logging.getLogger(__name__)
+    model_size, _, _, _, language = asr.transcribe_config()
+
+    audio = asr.audio_store.load(clip_path)[:int(seconds * SAMPLE_RATE)]
+    clip_duration = len(audio) / SAMPLE_RATE
+
+    results = []
+    for batch_size, compute_type, threads in candidates(asr.device):
+        # Thread count is fixed when a model loads, so start each
+        # combination from a cold registry
+        asr.models.clear()
+        try:
+            model = asr.load_whisper_model(model_size, compute_type, threads)
+        except ValueError as e:
+            logger.warning(f"Skipping {compute_type}: {e}")
+            continue
+
+        time = monotonic()
+        model.transcribe(audio, batch_size=batch_size, language=language)
+        duration = monotonic() - time
+
+        result = {
+            "batch_size": batch_size,
+            "compute_type": compute_type,
+            "threads": threads,
+            "duration": duration,
+            "rtf": duration / clip_duration,
+        }
+        logger.info(result)
+        results.append(result)
+
+    results.sort(key=lambda r: r["duration"])
+    if results:
+        best = results[0]
+        asr.profile.set(asr.device, model_size, {
+            "batch_size": best["batch_size"],
+            "compute_type": best["compute_type"],
+            "threads": best["threads"],
+            "rtf": best["rtf"],
+        })
+
+    return results
+
+
+def main():
+    """Tune ASR batch size, compute type and threads for this host."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("clip", help="calibration audio file")
+    parser.add_argument("-s", "--seconds", type=float, default=60.0,
+                        help="seconds of the clip to transcribe")
+    parser.add_argument("-v", "--verbose",
+                        help="increase output verbosity",
+                        action="store_true")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig()
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+    else:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    asr = ASR(os.getenv("HF_TOKEN", ""))
+    results = autotune(asr, args.clip, args.seconds)
+
+    print(f"{'batch':>5} {'compute':>13} {'threads':>7} "
+          f"{'seconds':>8} {'RTF':>6}")
+    for r in results:
+        threads = r["threads"] or "-"
+        print(f"{r['batch_size']:>5} {r['compute_type']:>13} "
+              f"{threads:>7} {r['duration']:>8.2f} {r['rtf']:>6.3f}")
+
+    if results:
+        print(f"Saved fastest settings to {asr.profile.path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from time import monotonic
+
+from dotenv import load_dotenv
+
+from ..models import DB_Meeting
+from ..access import AccessBase, select_many_from_table
+from .RAG import RAG
+from .chunking import Chunks
+
+
+class RateLimiter:
+
+    def __init__(self, per_minute: float):
+        """Initialise a limiter spacing calls evenly, at most per_minute
+        calls a minute, or without limit if 0."""
+        self.interval = 60 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self) -> None:
+        """Wait until the next call may start."""
+        async with self._lock:
+            now = monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class Backfill:
+
+    def __init__(self, target: str | None = None, rechunk: bool = False,
+                 batch_size: int | None = None,
+                 concurrency: int | None = None,
+                 rate: float | None = None,
+                 checkpoint_dir: str = "data/.cache/backfill"):
+        """Initialise re-embedding of every meeting into a new collection.
+
+        Chunks are read from the current collection (VECTOR_STORE_NAME),
+        or made again from the transcripts with rechunk, and embedded with
+        the currently configured embeddings. Chunks are embedded
+        batch_size at a time, at most concurrency batches at once and at
+        most rate batches a minute. At most concurrency meetings are in
+        flight, so only their chunks are held in memory. Unset values are
+        read from BACKFILL_BATCH_SIZE, BACKFILL_CONCURRENCY and
+        BACKFILL_BATCHES_PER_MINUTE (0 for no limit).
+
+        Finished meetings are recorded in a checkpoint per target
+        collection, so an interrupted backfill resumes where it stopped.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.rag = RAG()
+        self.source = os.environ.get("VECTOR_STORE_NAME", "deco3801")
+        if target is None:
+            target = f"{self.source}_{datetime.now():%Y%m%d%H%M%S}"
+        if target == self.source:
+            raise ValueError("Backfill target must be a new collection")
+        self.target = target
+        self.rechunk = rechunk
+
+        if batch_size is None:
+            batch_size = int(os.getenv("BACKFILL_BATCH_SIZE", "256"))
+        if concurrency is None:
+            concurrency = int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+        if rate is None:
+            rate = float(os.getenv("BACKFILL_BATCHES_PER_MINUTE", "0"))
+        self.batch_size = max(1, batch_size)
+        self.slots = asyncio.Semaphore(max(1, concurrency))
+        self.meeting_slots = asyncio.Semaphore(max(1, concurrency))
+        self.limiter = RateLimiter(rate)
+
+        self.checkpoint_path = Path(checkpoint_dir) / f"{target}.json"
+        self.done: set[int] = set()
+
+    def load_checkpoint(self) -> None:
+        """Resume from the checkpoint of the target collection, if any."""
+        try:
+            with open(self.checkpoint_path, "r", encoding="utf-8") as file:
+                checkpoint = json.load(file)
+        except FileNotFoundError:
+            return
+
+        if checkpoint["source"] != self.source \
+                or checkpoint["rechunk"] != self.rechunk:
+            raise ValueError(f"Checkpoint of {self.target} was made from "
+                             f"{checkpoint['source']} with rechunk "
+                             f"{checkpoint['rechunk']}")
+        self.done = set(checkpoint["done"])
+        self.logger.info(f"Resuming backfill of {self.target}, "
+                         f"{len(self.done)} meetings done")
+
+    def save_checkpoint(self) -> None:
+        """Store the checkpoint atomically."""
+        os.makedirs(self.checkpoint_path.parent, exist_ok=True)
+        temp_path = self.checkpoint_path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"source": self.source, "rechunk": self.rechunk,
+                       "done": sorted(self.done)}, file)
+        os.replace(temp_path, self.checkpoint_path)
+
+    def meeting_chunks(self, meeting: DB_Meeting) -> list:
+        """Return the chunks of a meeting to embed."""
+        if not self.rechunk:
+            return self.source_store.get_meeting_chunks(meeting.id)
+        if not meeting.drafted or not meeting.file_transcript:
+            return []
+        return self.chunker.chunk_transcript(meeting)
+
+    async def embed_batch(self, chunks: list) -> None:
+        """Embed a batch of prepared chunks into the target collection."""
+        async with self.slots:
+            await self.limiter.wait()
+            texts = [chunk.page_content for chunk in chunks]
+            embeddings = await asyncio.to_thread(
+                self.rag.embeddings.embed_documents, texts
+            )
+            await asyncio.to_thread(
+                self.target_store.add_embeddings,
+                texts, embeddings,
+                [chunk.metadata for chunk in chunks],
+                [chunk.id for chunk in chunks]
+            )
+
+    async def backfill_meeting(self, meeting: DB_Meeting) -> None:
+        """Embed all chunks of a meeting into the target collection."""
+        async with self.meeting_slots:
+            chunks = await asyncio.to_thread(self.meeting_chunks, meeting)
+            chunks = self.rag.prepare_chunks(meeting.id, chunks,
+                                             self.collection)
+
+            # Chunk ids are deterministic, so batches of an interrupted
+            # meeting are overwritten rather than duplicated
+            batches = [chunks[i:i + self.batch_size]
+                       for i in range(0, len(chunks), self.batch_size)]
+            await asyncio.gather(*(self.embed_batch(batch)
+                                   for batch in batches))
+
+        self.done.add(meeting.id)
+        self.save_checkpoint()
+        self.logger.info(f"Embedded {len(chunks)} chunks of meeting "
+                         f"{meeting.id} ({len(self.done)} done)")
+
+    async def run(self) -> None:
+        """Embed every meeting not yet done into the target collection."""
+        self.load_checkpoint()
+        self.source_store = self.rag.vector_store
+        self.target_store = self.rag.create_vector_store(self.target)
+        self.collection = self.target_store.collection_uuid()
+        if self.rechunk:
+            self.chunker = Chunks()
+
+        meetings = [meeting for meeting
+                    in await select_many_from_table(DB_Meeting)
+                    if meeting.id not in self.done]
+        self.logger.info(f"Backfilling {len(meetings)} meetings from "
+                         f"{self.source} into {self.target}")
+        await asyncio.gather(*(self.backfill_meeting(meeting)
+                               for meeting in meetings))
+
+    async def swap(self) -> str:
+        """Rename the target collection to VECTOR_STORE_NAME in one
+        transaction, and return the name the old collection is kept as."""
+        archive = f"{self.source}_old_{datetime.now():%Y%m%d%H%M%S}"
+        await AccessBase.db_execute_atomic([
+            ("UPDATE langchain_pg_collection SET name = %s WHERE name = %s;",
+             (archive, self.source)),
+            ("UPDATE langchain_pg_collection SET name = %s WHERE name = %s;",
+             (self.source, self.target)),
+        ])
+        self.checkpoint_path.unlink(missing_ok=True)
+        return archive
+
+
+async def main():
+    """Re-embed all meetings into a new collection and swap it in."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-v", "--verbose",
+                        help="increase output verbosity",
+                        action="store_true")
+    parser.add_argument("-t", "--target",
+                        help="collection to embed into, the same target "
+                             "resumes an interrupted backfill")
+    parser.add_argument("--rechunk", action="store_true",
+                        help="chunk transcripts again instead of reusing "
+                             "stored chunks")
+    parser.add_argument("--batch-size", type=int,
+                        help="chunks embedded per request")
+    parser.add_argument("--concurrency", type=int,
+                        help="requests made at once")
+    parser.add_argument("--rate", type=float,
+                        help="requests made per minute")
+    parser.add_argument("--no-swap", action="store_true",
+                        help="keep the current collection in use")
+
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig()
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+    else:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    backfill = Backfill(args.target, args.rechunk, args.batch_size,
+                        args.concurrency, args.rate)
+    print(f"Backfilling into {backfill.target}, run again with --target "
+          f"{backfill.target} to resume if interrupted")
+    await backfill.run()
+
+    if args.no_swap:
+        print(f"Backfilled {backfill.target}, set VECTOR_STORE_NAME to use "
+              f"it")
+        return
+
+    archive = await backfill.swap()
+    print(f"{backfill.target} is now {backfill.source}, the old collection "
+          f"is kept as {archive}")
+
+
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(
+            asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(main())
@@ -0,0 +1,286 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from time import monotonic
+
+import numpy as np
+from dotenv import load_dotenv
+
+from .audio_store import SAMPLE_RATE
+
+
+# Configuration used when no configuration file is given
+DEFAULT_CONFIGS = [{"name": "default"}]
+
+
+def synthetic_audio(path: Path, seconds: float, seed: int = 0) -> None:
+    """Write a 16kHz WAV file of tone bursts separated by quiet noise."""
+    rng = np.random.default_rng(seed)
+    samples = int(seconds * SAMPLE_RATE)
+    t = np.arange(samples) / SAMPLE_RATE
+    audio = 0.01 * rng.standard_normal(samples)
+
+    # Two second bursts of varying pitch every three seconds
+    bursts = (t % 3.0) < 2.0
+    pitch = 150 + 100 * np.floor(t / 3.0 % 4)
+    audio += bursts * 0.3 * np.sin(2 * np.pi * pitch * t)
+
+    pcm = (np.clip(audio, -1, 1) * 32767).astype(np.int16)
+    with wave.open(str(path), "wb") as file:
+        file.setnchannels(1)
+        file.setsampwidth(2)
+        file.setframerate(SAMPLE_RATE)
+        file.writeframes(pcm.tobytes())
+
+
+class RSSSampler(threading.Thread):
+
+    def __init__(self, pids, interval: float = 0.2):
+        """Initialise a sampler of the peak total resident memory (in MB)
+        of the processes whose ids pids() returns, such as this process and
+        its transcription workers."""
+        super().__init__(daemon=True)
+        self.pids = pids
+        self.interval = interval
+        self.peak = 0.0
+        self._stop_event = threading.Event()
+
+    @staticmethod
+    def rss(pid: int) -> float:
+        """Return the resident memory (in MB) of a process, 0 if gone."""
+        try:
+            with open(f"/proc/{pid}/status", "r", encoding="utf-8") as file:
+                for line in file:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 2**10
+        except OSError:
+            pass
+        return 0.0
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, sum(map(self.rss, self.pids())))
+
+    def stop(self) -> float | None:
+        """Stop sampling, and return the peak, None if not measurable."""
+        self._stop_event.set()
+        self.join()
+        return self.peak or None
+
+
+def run_config(config: dict, files: list[str]) -> dict:
+    """Run the ASR pipeline over files with a configuration.
+
+    Runs in its own process, so peak memory and model loads are measured
+    for this configuration alone. The stage cache is bypassed.
+    """
+    import torch
+    from .ASR import ASR
+    from .asr_profile import ASRProfile
+
+    os.environ.update(config.get("env", {}))
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        asr = ASR(os.getenv("HF_TOKEN", ""), cache_dir=cache_dir,
+                  transcript_dir=cache_dir, word_dir=cache_dir)
+        asr.device = config.get("device", asr.device)
+
+        # Benchmark the settings tuned for this host, not the defaults,
+        # while keeping the stage cache empty
+        asr.profile = ASRProfile()
+
+        # Include transcription worker processes in peak memory
+        def pids():
+            workers = list(asr._pool._processes) if asr._pool else []
+            return [os.getpid(), *workers]
+
+        sampler = RSSSampler(pids)
+        sampler.start()
+
+        # Override transcription settings for this run only
+        model_size = asr.transcribe_config()[0]
+        settings = {key: config[key] for key in
+                    ("batch_size", "compute_type", "threads") if key in config}
+        if settings:
+            defaults = asr.transcribe_config()
+            host_key = ASRProfile.host_key(asr.device, model_size)
+            asr.profile.profiles[host_key] = {
+                "compute_type": defaults[1],
+                "batch_size": defaults[2],
+                "threads": defaults[3],
+                **settings,
+            }
+
+        if asr.device == "cuda":
+            torch.cuda.reset_peak_memory_stats()
+
+        results = []
+        for file_path in files:
+            audio_seconds = len(asr.audio_store.load(file_path)) / SAMPLE_RATE
+            # Whisper, alignment and diarization models share one registry
+            load_time = asr.models.load_time
+
+            time = monotonic()
+            asr.transcribe_audio_file_whisperx_raw(file_path)
+            duration = monotonic() - time
+
+            model_load = asr.models.load_time - load_time
+            results.append({
+                "file": Path(file_path).name,
+                "audio_seconds": audio_seconds,
+                "duration": duration,
+                "model_load": model_load,
+                "inference": duration - model_load,
+                "rtf": {stage: timing / audio_seconds for stage, timing
+                        in asr.last_timings.items()},
+            })
+
+        peak_vram = None
+        if asr.device == "cuda":
+            peak_vram = torch.cuda.max_memory_allocated() / 2**20
+
+        peak_rss = sampler.stop()
+        if asr._pool is not None:
+            asr._pool.shutdown()
+
+    # Without /proc, fall back on the peak of this process plus that of
+    # its largest worker. ru_maxrss is in KB on Linux and bytes on macOS,
+    # and the resource module is unavailable on Windows
+    if peak_rss is None:
+        try:
+            import resource
+            peak_rss = sum(
+                resource.getrusage(who).ru_maxrss
+                for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN)
+            )
+            peak_rss /= 2**20 if sys.platform == "darwin" else 2**10
+        except ImportError:
+            peak_rss = None
+
+    total_audio = sum(r["audio_seconds"] for r in results)
+    stages = {stage for r in results for stage in r["rtf"]}
+    return {
+        "name": config["name"],
+        "config": config,
+        "files": results,
+        "rtf": {
+            stage: sum(r["rtf"].get(stage, 0) * r["audio_seconds"]
+                       for r in results) / total_audio
+            for stage in stages
+        },
+        "model_load": sum(r["model_load"] for r in results),
+        "inference": sum(r["inference"] for r in results),
+        "peak_rss_mb": peak_rss,
+        "peak_vram_mb": peak_vram,
+    }
+
+
+def benchmark(configs: list[dict], files: list[str]) -> dict:
+    """Benchmark each configuration in a fresh process."""
+    logger = logging.getLogger(__name__)
+    report = {"files": [Path(f).name for f in files], "configs": []}
+    context = multiprocessing.get_context("spawn")
+    for config in configs:
+        logger.info(f"Benchmarking {config['name']}")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run_config, config, files).result()
+        report["configs"].append(result)
+    return report
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Return descriptions of stages slower than the baseline."""
+    baseline_configs = {c["name"]: c for c in baseline["configs"]}
+    regressions = []
+    for config in report["configs"]:
+        previous = baseline_configs.get(config["name"])
+        if previous is None:
+            continue
+        for stage, rtf in config["rtf"].items():
+            previous_rtf = previous["rtf"].get(stage)
+            if previous_rtf and rtf > previous_rtf * (1 + tolerance):
+                regressions.append(
+                    f"{config['name']} {stage}: RTF {rtf:.3f} vs "
+                    f"baseline {previous_rtf:.3f}")
+    return regressions
+
+
+def main():
+    """Benchmark the real-time factor of the ASR pipeline."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-c", "--corpus", default="data/recordings",
+                        help="directory of recordings to transcribe")
+    parser.add_argument("-s", "--synthetic", type=float,
+                        help="benchmark synthetic audio of this many "
+                             "seconds instead of the corpus")
+    parser.add_argument("--configs",
+                        help="JSON file with a list of configurations")
+    parser.add_argument("-o", "--output", default="bench_output.json",
+                        help="report output file")
+    parser.add_argument("-b", "--baseline",
+                        help="report to compare against")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.1,
+                        help="allowed fractional RTF increase over baseline")
+    parser.add_argument("-v", "--verbose",
+                        help="increase output verbosity",
+                        action="store_true")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig()
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+    else:
+        logging.getLogger().setLevel(logging.INFO)
+
+    configs = DEFAULT_CONFIGS
+    if args.configs:
+        with open(args.configs, "r", encoding="utf-8") as file:
+            configs = json.load(file)
+
+    with tempfile.TemporaryDirectory() as synthetic_dir:
+        if args.synthetic:
+            synthetic_file = Path(synthetic_dir) / "synthetic.wav"
+            synthetic_audio(synthetic_file, args.synthetic)
+            files = [str(synthetic_file)]
+        else:
+            files = sorted(str(f) for f in Path(args.corpus).glob("*.wav"))
+
+        report = benchmark(configs, files)
+
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    for config in report["configs"]:
+        stages = ", ".join(f"{stage} {rtf:.3f}"
+                           for stage, rtf in config["rtf"].items())
+        print(f"{config['name']}: RTF {stages}; load "
+              f"{config['model_load']:.1f}s, inference "
+              f"{config['inference']:.1f}s")
+        if config["peak_rss_mb"] is not None:
+            print(f"{config['name']}: peak RSS "
+                  f"{config['peak_rss_mb']:.0f}MB")
+        if config["peak_vram_mb"] is not None:
+            print(f"{config['name']}: peak VRAM "
+                  f"{config['peak_vram_mb']:.0f}MB")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,5 @@
 import os
 import logging
-import json
 from typing import List
 from time import monotonic
 
@@ -10,6 +9,7 @@ from langchain_ollama import OllamaEmbeddings
 from langchain_openai import OpenAIEmbeddings
 
 from ..models import DB_Meeting
+from .transcript_writer import TranscriptWriter
 from math import exp
 
 
@@ -34,17 +34,11 @@ class Chunks:
         return embedding
 
     def load_jsonl_file(self, file_path):
-        """Load a JSONL file from the given file path as a string."""
-        with open(file_path, 'r', encoding='utf-8') as file:
-            jsonl_string = file.read()
-        return jsonl_string
+        """Load lines of a JSONL transcript."""
+        return list(TranscriptWriter.read_lines(file_path))
 
-    def merge_speaker_lines(self, jsonl_string):
+    def merge_speaker_lines(self, transcript_lines: List[dict]):
         """Merge consecutive lines by the same speaker in a transcript"""
-        # Parse the JSONL input into a list of dictionaries
-        transcript_lines = []
-        for line in jsonl_string.strip().split("\n"):
-            transcript_lines.append(json.loads(line))
 
         # Combine consecutive lines by the same speaker
         merged_lines = []
@@ -52,7 +46,11 @@ class Chunks:
 
         for i in range(1, len(transcript_lines)):
             current_line = transcript_lines[i]
-            if current_line['speaker'] == current_block['speaker']:
+            # Unknown speakers (e.g. in draft transcripts) are never merged,
+            # as they may not be the same person
+            speaker = current_line['speaker']
+            if (speaker == current_block['speaker']
+                    and speaker != "UNKNOWN_SPEAKER"):
                 current_block['text'] += " " + current_line['text']
                 current_block['end_time'] = current_line['end_time']
             else:
@@ -162,8 +160,8 @@ class Chunks:
     def chunk_transcript(self, meeting: DB_Meeting) -> List[Document]:
         """Chunk a meeting using semantic chunking."""
         file_path = meeting.file_transcript
-        jsonl = self.load_jsonl_file(file_path)
-        merged = self.merge_speaker_lines(jsonl)
+        lines = self.load_jsonl_file(file_path)
+        merged = self.merge_speaker_lines(lines)
         time = monotonic()
         chunks = self.semantic_chunking(merged, file_path, 0.3)
         duration = monotonic() - time
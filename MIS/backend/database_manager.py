@@ -4,6 +4,10 @@ import logging
 from ..access import AccessBase
 
 
+# Channel notified of new meetings and meeting status changes
+MEETING_CHANNEL = "meeting_status"
+
+
 class DB_Manager:
 
     @staticmethod
@@ -24,7 +28,14 @@ class DB_Manager:
                 file_recording TEXT,
                 file_transcript TEXT,
                 summary TEXT,
-                status TEXT
+                status TEXT,
+                language TEXT,
+                duration REAL,
+                priority INTEGER DEFAULT 0,
+                drafted BOOLEAN NOT NULL DEFAULT FALSE,
+                transcribed BOOLEAN NOT NULL DEFAULT FALSE,
+                summarised BOOLEAN NOT NULL DEFAULT FALSE,
+                embedded BOOLEAN NOT NULL DEFAULT FALSE
             );
 
             CREATE TABLE IF NOT EXISTS key_points (
@@ -44,7 +55,8 @@ class DB_Manager:
             CREATE TABLE IF NOT EXISTS tag (
                 id SERIAL PRIMARY KEY,
                 name TEXT,
-                last_modified DATE
+                last_modified DATE,
+                language TEXT
             );
 
             CREATE TABLE IF NOT EXISTS meeting_tag (
@@ -59,7 +71,8 @@ class DB_Manager:
                 id SERIAL PRIMARY KEY,
                 name TEXT,
                 filter JSONB,
-                history JSONB[]
+                history JSONB[],
+                last_active TIMESTAMPTZ
             );
 
             CREATE TABLE IF NOT EXISTS chat_tag (
@@ -70,6 +83,21 @@ class DB_Manager:
                 PRIMARY KEY (chat_id, tag_id)
             );
 
+            CREATE TABLE IF NOT EXISTS job (
+                id SERIAL PRIMARY KEY,
+                meeting_id INTEGER REFERENCES meeting(id)
+                ON DELETE CASCADE ON UPDATE CASCADE,
+                stage TEXT,
+                status TEXT,
+                attempts INTEGER DEFAULT 0,
+                queued_at TIMESTAMPTZ DEFAULT now(),
+                next_run_at TIMESTAMPTZ,
+                last_error TEXT,
+                claimed_by TEXT,
+                lease_expires TIMESTAMPTZ,
+                UNIQUE (meeting_id, stage)
+            );
+
             CREATE TABLE IF NOT EXISTS document (
                 id SERIAL PRIMARY KEY,
                 meeting_id INTEGER REFERENCES meeting(id)
@@ -82,6 +110,102 @@ class DB_Manager:
         )
         logger.debug("Tables setup successfully.")
 
+        # Columns added since the tables were first created
+        await AccessBase.db_execute(
+            """
+            ALTER TABLE meeting ADD COLUMN IF NOT EXISTS language TEXT;
+            ALTER TABLE tag ADD COLUMN IF NOT EXISTS language TEXT;
+            ALTER TABLE meeting ADD COLUMN IF NOT EXISTS duration REAL;
+            ALTER TABLE meeting
+                ADD COLUMN IF NOT EXISTS priority INTEGER DEFAULT 0;
+            ALTER TABLE chat ADD COLUMN IF NOT EXISTS last_active TIMESTAMPTZ;
+            ALTER TABLE job
+                ADD COLUMN IF NOT EXISTS queued_at TIMESTAMPTZ DEFAULT now();
+            ALTER TABLE meeting
+                ADD COLUMN IF NOT EXISTS drafted
+                    BOOLEAN NOT NULL DEFAULT FALSE,
+                ADD COLUMN IF NOT EXISTS transcribed
+                    BOOLEAN NOT NULL DEFAULT FALSE,
+                ADD COLUMN IF NOT EXISTS summarised
+                    BOOLEAN NOT NULL DEFAULT FALSE,
+                ADD COLUMN IF NOT EXISTS embedded
+                    BOOLEAN NOT NULL DEFAULT FALSE;
+            """
+        )
+
+        # Stage flags of meetings processed before they were added
+        await AccessBase.db_execute(
+            """
+            UPDATE meeting SET
+                drafted = status IN ('Drafted', 'Draft Ready', 'Transcribed',
+                                     'Summarised', 'Ready'),
+                transcribed = status IN ('Transcribed', 'Summarised',
+                                         'Ready'),
+                summarised = status IN ('Summarised', 'Ready'),
+                embedded = status IN ('Draft Ready', 'Ready')
+            WHERE NOT (drafted OR transcribed OR summarised OR embedded)
+              AND status IS DISTINCT FROM 'Queued';
+            """
+        )
+        logger.debug("Tables migrated successfully.")
+
+        # A meeting's status is derived from the stages it has completed,
+        # which may complete concurrently
+        await AccessBase.db_execute(
+            """
+            CREATE OR REPLACE FUNCTION derive_meeting_status()
+            RETURNS trigger AS $$
+            BEGIN
+                NEW.status := CASE
+                    WHEN NEW.transcribed AND NEW.summarised AND NEW.embedded
+                        THEN 'Ready'
+                    WHEN NEW.transcribed AND NEW.summarised
+                        THEN 'Summarised'
+                    WHEN NEW.transcribed AND NEW.embedded THEN 'Searchable'
+                    WHEN NEW.transcribed THEN 'Transcribed'
+                    WHEN NEW.drafted AND NEW.embedded THEN 'Draft Ready'
+                    WHEN NEW.drafted THEN 'Drafted'
+                    ELSE 'Queued'
+                END;
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            DROP TRIGGER IF EXISTS meeting_status_derive ON meeting;
+            CREATE TRIGGER meeting_status_derive
+            BEFORE INSERT OR UPDATE ON meeting
+            FOR EACH ROW EXECUTE FUNCTION derive_meeting_status();
+            """
+        )
+        logger.debug("Meeting status derivation setup successfully.")
+
+        # Notify workers of meeting status changes, so they need not poll.
+        # Statuses are derived, so they change without being set
+        await AccessBase.db_execute(
+            f"""
+            CREATE OR REPLACE FUNCTION notify_meeting_status()
+            RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'UPDATE'
+                   AND OLD.status IS NOT DISTINCT FROM NEW.status THEN
+                    RETURN NEW;
+                END IF;
+                PERFORM pg_notify(
+                    '{MEETING_CHANNEL}',
+                    json_build_object('id', NEW.id, 'status', NEW.status)::text
+                );
+                RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+
+            DROP TRIGGER IF EXISTS meeting_status_notify ON meeting;
+            CREATE TRIGGER meeting_status_notify
+            AFTER INSERT OR UPDATE ON meeting
+            FOR EACH ROW EXECUTE FUNCTION notify_meeting_status();
+            """
+        )
+        logger.debug("Meeting status notifications setup successfully.")
+
     @classmethod
     async def full_setup(cls):
         await cls.setup_table_structure()
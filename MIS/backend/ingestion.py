@@ -1,46 +1,273 @@
+import asyncio
 import os
 import logging
+import socket
+import threading
+from typing import Any
 
-from ..models import DB_Meeting
-from ..access import select_many_from_table, update_table_from_model
-from .ASR import ASR
+from ..models import DB_Job, DB_Meeting
+from ..access import AccessBase
+from ..access import select_from_table, update_table
 from .manager import Manager
-from .chunking import Chunks
+from .database_manager import MEETING_CHANNEL
+from .jobs import JobQueue
+from .workers import StageExecutor, StageWorker
+
+
+# Pipeline roles -> stages they run. ASR needs torch and whisperx, the
+# other stages only langchain and the LLM and embedding services
+ROLES = {
+    "asr": ["draft", "transcribe"],
+    "summarise": ["summarise"],
+    "embed": ["embed"],
+}
+
+# Pipeline components of this process, created (and their modules
+# imported) on first use so processes only load what their stages need
+_components: dict[str, Any] = {}
+_components_lock = threading.Lock()
+
+# ASR shares one device and model registry between its stages, so
+# transcriptions in one process run one at a time
+_asr_lock = threading.Lock()
+
+
+def _component(name: str) -> Any:
+    """Return a pipeline component of this process, creating it if needed."""
+    with _components_lock:
+        if name not in _components:
+            if name == "asr":
+                from .ASR import ASR
+                _components[name] = ASR(os.environ['HF_TOKEN'])
+            elif name == "rag":
+                from .RAG import RAG
+                _components[name] = RAG()
+            elif name == "chunks":
+                from .chunking import Chunks
+                _components[name] = Chunks()
+            else:
+                raise ValueError(f"Unknown pipeline component: {name}")
+        return _components[name]
+
+
+def _transcribe(recording: str, **kwargs) -> tuple[str, str | None]:
+    """Return the transcript and language of a recording."""
+    with _asr_lock:
+        asr = _component("asr")
+        transcript = asr.transcribe_audio_file(recording, **kwargs)
+        return transcript, asr.last_language
+
+
+def _summarise(transcript: str) -> dict:
+    """Return the summary, key points and action items of a transcript."""
+    return _component("rag").summarise_meeting(transcript)
+
+
+def _embed(meeting: DB_Meeting) -> None:
+    """Chunk and embed the transcript of a meeting."""
+    chunks = _component("chunks").chunk_transcript(meeting)
+    _component("rag").embed_meeting(meeting, chunks)
 
 
 class Ingestion:
-    def __init__(self):
-        self.manager = Manager()
-        self.asr = ASR(os.environ['HF_TOKEN'])
-        self.chunks = Chunks()
+    def __init__(self, roles: list[str] | None = None):
+        """Initialise the pipeline stages of roles, all by default.
+
+        Processes running different roles share the work of the same
+        database, so each role can be run and scaled on its own hosts.
+        """
         self.logger = logging.getLogger(__name__)
+        if roles is None:
+            roles = list(ROLES)
+        unknown = set(roles) - set(ROLES)
+        if unknown:
+            raise ValueError(f"Unknown pipeline roles: {sorted(unknown)}")
+        run_stages = {stage for role in roles for stage in ROLES[role]}
 
-    async def transcribe_next_meeting(self):
-        meetings = await select_many_from_table(
-            DB_Meeting, ["Queued"], ("status")
-        )
-        if not len(meetings) > 0:
-            return
+        # Quickly draft and embed a transcript before the full transcription
+        # if a draft model is configured
+        self.draft = bool(os.getenv("WHISPER_DRAFT_MODEL"))
+
+        # Blocking work runs in executors sized per role, keeping the
+        # event loop free for database work and scheduling. Drafting and
+        # transcription share the ASR executor and its models
+        self.executors = {role: StageExecutor(role) for role in roles}
+
+        # A timed out ASR thread keeps running and holding the ASR lock, so
+        # every later transcription would wait on it and time out too
+        asr = self.executors.get("asr")
+        if asr is not None and asr.kind == "thread" \
+                and asr.timeout is not None:
+            raise ValueError("ASR_TIMEOUT needs ASR_EXECUTOR=process")
+
+        # Jobs of a stage are claimed by one backend process at a time,
+        # and reclaimed by others if its lease is not renewed
+        self.jobs = JobQueue(f"{socket.gethostname()}:{os.getpid()}")
+        self.leases: dict[int, asyncio.Task] = {}
+
+        # Stage -> stage flags of meetings waiting for it, its handler and
+        # the (stage, flag) it runs after, see JobQueue.waiting_clause.
+        # Summarisation and embedding both only need the transcript, so
+        # they run side by side. Transcription sets drafted too, as a full
+        # transcript stands in for a draft
+        self.stages = {
+            "transcribe": (
+                {"transcribed": False}, self.transcribe_meeting,
+                # Draft first, unless drafting keeps failing. Embedding the
+                # draft may still be running
+                ("draft", "drafted") if self.draft else None
+            ),
+            "summarise": (
+                {"transcribed": True, "summarised": False},
+                self.summarise_meeting, None
+            ),
+            "embed": (
+                {"drafted": True, "embedded": False}, self.embed_meeting,
+                None
+            ),
+        }
+        if self.draft:
+            self.stages["draft"] = (
+                {"drafted": False, "transcribed": False}, self.draft_meeting,
+                None
+            )
+
+        # Stages of other roles are left to processes running them
+        self.stages = {stage: value for stage, value in self.stages.items()
+                       if stage in run_stages}
+
+    async def run(self):
+        """Run every stage concurrently, each with its own worker."""
+        workers = [
+            StageWorker(stage, self.claimer(stage), self.job_handler(stage))
+            for stage in self.stages
+        ]
+        try:
+            await asyncio.gather(self.listen(workers),
+                                 *(worker.run() for worker in workers))
+        finally:
+            for executor in self.executors.values():
+                executor.shutdown()
 
-        meeting = meetings[0]
+    async def listen(self, workers: list[StageWorker]):
+        """Wake workers whenever a meeting is added or changes status.
+
+        Every completed stage changes a meeting's status.
+        """
+        while True:
+            try:
+                async for payload in AccessBase.db_listen(MEETING_CHANNEL):
+                    self.logger.debug(f"Meeting status changed: {payload}")
+                    for worker in workers:
+                        worker.wake()
+            except Exception as e:
+                self.logger.warning(f"Meeting status listener failed: {e}")
+
+            # Reconnect, polling until then
+            await asyncio.sleep(5)
+
+    def claimer(self, stage: str):
+        """Return a function claiming jobs of a stage."""
+        async def claim(limit: int) -> list[DB_Job]:
+            flags, _, after = self.stages[stage]
+            jobs = await self.jobs.claim(stage, flags, limit, after)
+            for job in jobs:
+                self.logger.debug(f"Claimed job {job.id} ({stage} of "
+                                  f"meeting {job.meeting_id})")
+                self.leases[job.id] = asyncio.create_task(
+                    self.renew_lease(job)
+                )
+            return jobs
+
+        return claim
+
+    async def renew_lease(self, job: DB_Job):
+        while True:
+            await asyncio.sleep(self.jobs.lease_seconds / 3)
+            try:
+                if not await self.jobs.renew(job):
+                    self.logger.warning(f"Lost claim on job {job.id}")
+                    return
+            except Exception as e:
+                self.logger.warning(
+                    f"Lease renewal failed for job {job.id}: {e}"
+                )
+
+    def job_handler(self, stage: str):
+        """Return a function running claimed jobs of a stage.
+
+        Failed jobs are retried with backoff until they are dead. Jobs of
+        meetings no longer waiting for the stage are dropped.
+        """
+        flags, handle, after = self.stages[stage]
+
+        async def run_job(job: DB_Job):
+            try:
+                # Jobs reclaimed after crashing their workers too often
+                if job.attempts > self.jobs.max_attempts:
+                    await self.jobs.fail(job, "Lease expired too often")
+                    return
+
+                meeting = await select_from_table(DB_Meeting, job.meeting_id)
+                if meeting is None or not await self.jobs.is_waiting(
+                    meeting.id, flags, after
+                ):
+                    await self.jobs.complete(job)
+                    return
+
+                try:
+                    await handle(meeting)
+                except Exception as e:
+                    self.logger.exception(
+                        f"{stage} failed for meeting id {meeting.id}"
+                    )
+                    await self.jobs.fail(job, f"{type(e).__name__}: {e}")
+                    return
+
+                await self.jobs.complete(job)
+            finally:
+                lease = self.leases.pop(job.id, None)
+                if lease is not None:
+                    lease.cancel()
+
+        return run_job
+
+    async def draft_meeting(self, meeting: DB_Meeting):
         recording = meeting.file_recording
-        meeting.file_transcript = self.asr.transcribe_audio_file(recording)
-        meeting.status = "Transcribed"
-        await update_table_from_model(meeting)
+        language = await Manager.get_meeting_language(meeting)
+        transcript, _ = await self.executors["asr"].run(
+            _transcribe, recording, draft=True, language=language
+        )
 
-    async def summarise_next_meeting(self):
-        meetings = await select_many_from_table(
-            DB_Meeting, ["Transcribed"], ("status")
+        # The language the small draft model detects is not kept, so the
+        # full transcription detects it again with the larger model
+        await self.update_meeting(meeting, file_transcript=transcript,
+                                  drafted=True)
+
+    async def transcribe_meeting(self, meeting: DB_Meeting):
+        # Skip language detection when the meeting or its tags give a
+        # language, and keep the detected language for later passes
+        recording = meeting.file_recording
+        language = await Manager.get_meeting_language(meeting)
+        speaker_group = await Manager.get_speaker_group(meeting)
+        transcript, language = await self.executors["asr"].run(
+            _transcribe, recording, language=language,
+            speaker_group=speaker_group
         )
-        if not len(meetings) > 0:
-            return
 
-        meeting = meetings[0]
+        # Embeddings of a draft are replaced by those of the transcript
+        await self.update_meeting(meeting, file_transcript=transcript,
+                                  language=language, drafted=True,
+                                  transcribed=True, embedded=False)
+
+    async def summarise_meeting(self, meeting: DB_Meeting):
         self.logger.debug(f"Starting summarisation of {meeting.name}")
         with open(meeting.file_transcript, 'r', encoding="utf-8") as file:
             transcript = file.read()
 
-        summary = self.manager.rag.summarise_meeting(transcript)
+        summary = await self.executors["summarise"].run(
+            _summarise, transcript
+        )
         self.logger.debug(summary)
 
         action_items = summary["action_items"]
@@ -50,7 +277,7 @@ class Ingestion:
             )
         else:
             for action_item in action_items.action_items:
-                await self.manager.create_action_item(action_item, meeting)
+                await Manager.create_action_item(action_item, meeting)
 
         key_points = summary["key_points"]
         if key_points is None:
@@ -59,23 +286,28 @@ class Ingestion:
             )
         else:
             for key_point in key_points.key_points:
-                await self.manager.create_key_point(key_point, meeting)
+                await Manager.create_key_point(key_point, meeting)
 
-        meeting.summary = summary["abstract_summary"]
-        meeting.status = "Summarised"
-        await update_table_from_model(meeting)
+        await self.update_meeting(meeting,
+                                  summary=summary["abstract_summary"],
+                                  summarised=True)
 
-    async def ingest_next_meeting(self):
-        meetings = await select_many_from_table(
-            DB_Meeting, ["Summarised"], ("status")
-        )
-        if not len(meetings) > 0:
-            return
+    async def embed_meeting(self, meeting: DB_Meeting):
+        await self.executors["embed"].run(_embed, meeting)
 
-        meeting = meetings[0]
-        chunks = self.chunks.chunk_transcript(meeting)
-
-        self.manager.rag.embed_meeting(meeting, chunks)
+        # A draft replaced by the full transcript while being embedded is
+        # left unembedded, so the transcript is embedded next
+        await self.update_meeting(
+            meeting, {"file_transcript": meeting.file_transcript},
+            embedded=True
+        )
 
-        meeting.status = "Ready"
-        await update_table_from_model(meeting)
+    @staticmethod
+    async def update_meeting(meeting: DB_Meeting, conditions: dict = None,
+                             **fields):
+        """Update only the given fields of a meeting, as other stages may
+        update it at the same time, if it still matches conditions. Its
+        status is derived by the database.
+        """
+        conditions = {"id": meeting.id, **(conditions or {})}
+        await update_table(DB_Meeting, fields, conditions)
@@ -0,0 +1,355 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from dotenv import load_dotenv
+
+from ..models import DB_Job
+from ..access import AccessBase, claim_from_table, renew_claim
+from ..access import select_many_from_table, update_table
+
+
+# Longest error message kept on a job
+MAX_ERROR_LENGTH = 2000
+
+# Rough seconds of work per second of audio of each stage, used to
+# estimate when queued jobs start
+STAGE_RTF = {
+    "draft": 0.05,
+    "transcribe": 0.3,
+    "summarise": 0.05,
+    "embed": 0.02,
+}
+
+# Priority score of a job, the highest score is claimed first. Each
+# second waiting adds a second, so long jobs cannot starve
+PRIORITY_SCORE = """
+    EXTRACT(EPOCH FROM now() - COALESCE(job.queued_at, now()))
+    + (SELECT COALESCE(m.priority, 0) * %s
+              - COALESCE(m.duration, 0) * %s
+              + CASE WHEN EXISTS (
+                    SELECT 1 FROM public.meeting_tag AS mt
+                    JOIN public.chat_tag AS ct ON ct.tag_id = mt.tag_id
+                    JOIN public.chat AS c ON c.id = ct.chat_id
+                    WHERE mt.meeting_id = m.id
+                      AND c.last_active > now() - make_interval(secs => %s)
+                ) THEN %s ELSE 0 END
+       FROM public.meeting AS m WHERE m.id = job.meeting_id)
+"""
+
+
+class JobQueue:
+
+    def __init__(self, owner: str, lease_seconds: float | None = None,
+                 max_attempts: int | None = None,
+                 backoff: float | None = None,
+                 max_backoff: float | None = None):
+        """Initialise a durable queue of stage jobs, one per meeting and
+        stage.
+
+        Failed jobs are retried after backoff seconds, doubling with every
+        attempt up to max_backoff, and become dead after max_attempts.
+        Unset values are read from LEASE_SECONDS, JOB_MAX_ATTEMPTS,
+        JOB_BACKOFF_SECONDS and JOB_MAX_BACKOFF_SECONDS.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.owner = owner
+        if lease_seconds is None:
+            lease_seconds = float(os.getenv("LEASE_SECONDS", "300"))
+        if max_attempts is None:
+            max_attempts = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+        if backoff is None:
+            backoff = float(os.getenv("JOB_BACKOFF_SECONDS", "30"))
+        if max_backoff is None:
+            max_backoff = float(os.getenv("JOB_MAX_BACKOFF_SECONDS", "3600"))
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        # Pending jobs are ordered by priority score: a point of meeting
+        # priority counts as PRIORITY_WEIGHT seconds of waiting, a second
+        # of audio as DURATION_WEIGHT seconds less, and a chat active on
+        # the meeting within CHAT_ACTIVE_SECONDS as CHAT_WEIGHT seconds
+        self.score_params = (
+            float(os.getenv("PRIORITY_WEIGHT", "3600")),
+            float(os.getenv("DURATION_WEIGHT", "1")),
+            float(os.getenv("CHAT_ACTIVE_SECONDS", "600")),
+            float(os.getenv("CHAT_WEIGHT", "3600")),
+        )
+
+    @staticmethod
+    def waiting_clause(flags: dict[str, bool],
+                       after: tuple[str, str] | None = None
+                       ) -> tuple[str, tuple]:
+        """Return a condition on public.meeting and its values selecting
+        meetings waiting for a stage.
+
+        Waiting meetings have the given stage flags. With after, a
+        (stage, flag) pair, they have also either completed that earlier
+        stage or its job is dead, so they are not held up forever by an
+        optional stage that keeps failing.
+        """
+        clauses = [f"meeting.{flag} = %s" for flag in flags]
+        values = tuple(flags.values())
+        if after is not None:
+            prior_stage, prior_flag = after
+            clauses.append(
+                f"""(meeting.{prior_flag} OR EXISTS (
+                    SELECT 1 FROM public.job AS prior
+                    WHERE prior.meeting_id = meeting.id
+                      AND prior.stage = %s AND prior.status = 'Dead'))"""
+            )
+            values += (prior_stage,)
+        return ' AND '.join(clauses), values
+
+    @staticmethod
+    async def materialise(stage: str, flags: dict[str, bool],
+                          after: tuple[str, str] | None = None) -> None:
+        """Create jobs for meetings waiting for a stage, see
+        waiting_clause.
+
+        Finished jobs of meetings waiting again, such as a draft to be
+        embedded again after full transcription, are reset. Dead jobs stay
+        dead until requeued.
+        """
+        where_clause, values = JobQueue.waiting_clause(flags, after)
+        await AccessBase.db_execute(
+            f"""
+            INSERT INTO public.job (meeting_id, stage, status, attempts)
+            SELECT meeting.id, %s, 'Pending', 0 FROM public.meeting
+            WHERE {where_clause}
+            ON CONFLICT (meeting_id, stage) DO UPDATE
+            SET status = 'Pending', attempts = 0, queued_at = now(),
+                next_run_at = NULL, last_error = NULL
+            WHERE job.status = 'Done';
+            """,
+            (stage, *values)
+        )
+
+    @staticmethod
+    async def is_waiting(meeting_id: int, flags: dict[str, bool],
+                         after: tuple[str, str] | None = None) -> bool:
+        """Return whether a meeting is still waiting for a stage."""
+        where_clause, values = JobQueue.waiting_clause(flags, after)
+        row = await AccessBase.db_fetchone(
+            f"""
+            SELECT 1 FROM public.meeting
+            WHERE meeting.id = %s AND {where_clause};
+            """,
+            (meeting_id, *values)
+        )
+        return row is not None
+
+    async def claim(self, stage: str, flags: dict[str, bool], limit: int,
+                    after: tuple[str, str] | None = None) -> list[DB_Job]:
+        """Claim jobs of a stage that are due, leased to this owner."""
+        await self.materialise(stage, flags, after)
+        return await claim_from_table(
+            DB_Job, {"Pending": "Running"}, "status", self.owner,
+            self.lease_seconds, limit, conditions={"stage": stage},
+            ready_field="next_run_at", counter_field="attempts",
+            order_by=f"{PRIORITY_SCORE} DESC", order_params=self.score_params
+        )
+
+    async def renew(self, job: DB_Job) -> bool:
+        """Extend the lease of a claimed job, False if it was lost."""
+        return await renew_claim(job, self.owner, self.lease_seconds)
+
+    async def release(self, job: DB_Job, **fields) -> bool:
+        """Release a job claimed by this owner, updating fields.
+
+        Returns False, leaving the job as is, if the claim was lost, such
+        as to another worker after the lease expired.
+        """
+        updated = await update_table(
+            DB_Job, {**fields, "claimed_by": None, "lease_expires": None},
+            {"id": job.id, "status": "Running", "claimed_by": self.owner}
+        )
+        if not updated:
+            self.logger.warning(f"Lost claim on job {job.id} ({job.stage} "
+                                f"of meeting {job.meeting_id}), leaving it "
+                                f"to its new owner")
+        return bool(updated)
+
+    async def complete(self, job: DB_Job) -> bool:
+        """Mark a job as done, False if its claim was lost."""
+        return await self.release(job, status="Done", last_error=None)
+
+    async def fail(self, job: DB_Job, error: str) -> bool:
+        """Schedule a failed job for retry, or mark it dead. Returns False
+        if its claim was lost."""
+        last_error = error[:MAX_ERROR_LENGTH]
+        if job.attempts >= self.max_attempts:
+            if not await self.release(job, status="Dead",
+                                      last_error=last_error):
+                return False
+            self.logger.error(f"Job {job.id} ({job.stage} of meeting "
+                              f"{job.meeting_id}) is dead after "
+                              f"{job.attempts} attempts: {error}")
+            return True
+
+        delay = min(self.backoff * 2 ** (job.attempts - 1), self.max_backoff)
+        next_run_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        if not await self.release(job, status="Pending",
+                                  next_run_at=next_run_at,
+                                  last_error=last_error):
+            return False
+        self.logger.warning(f"Job {job.id} ({job.stage} of meeting "
+                            f"{job.meeting_id}) failed, retrying in "
+                            f"{delay:.0f}s: {error}")
+        return True
+
+    async def queue(self, stage: str) -> list[dict]:
+        """Return pending jobs of a stage in the order they will run.
+
+        Each entry has the job, its meeting's audio duration, its position
+        in the queue and an estimated start time, assuming the stage's
+        workers (<STAGE>_CONCURRENCY) work through the queue in order.
+        Running jobs are assumed to be half done.
+        """
+        rows = await AccessBase.db_fetchall(
+            f"""
+            SELECT job.*, meeting.duration AS meeting_duration,
+                   {PRIORITY_SCORE} AS score
+            FROM public.job
+            JOIN public.meeting ON meeting.id = job.meeting_id
+            WHERE job.stage = %s AND job.status IN ('Pending', 'Running')
+            ORDER BY job.status = 'Running' DESC, score DESC;
+            """,
+            self.score_params + (stage,)
+        )
+
+        concurrency = max(1, int(os.getenv(f"{stage.upper()}_CONCURRENCY",
+                                           "1")))
+        rtf = STAGE_RTF.get(stage, 0.1)
+        now = datetime.now(timezone.utc)
+        queue = []
+        ahead = 0.0
+        for row in rows:
+            duration = row.pop("meeting_duration") or 0.0
+            row.pop("score")
+            job = DB_Job(**row)
+            estimate = duration * rtf
+            if job.status == "Running":
+                ahead += estimate / 2
+                continue
+
+            start = now + timedelta(seconds=ahead / concurrency)
+            if job.next_run_at is not None:
+                start = max(start, job.next_run_at)
+            queue.append({
+                "job": job,
+                "duration": duration,
+                "position": len(queue) + 1,
+                "estimated_start": start,
+            })
+            ahead += estimate
+        return queue
+
+    async def queue_positions(self) -> dict[int, dict]:
+        """Return meeting id -> queue entry of its next pending job."""
+        positions = {}
+        for stage in STAGE_RTF:
+            for entry in await self.queue(stage):
+                positions.setdefault(entry["job"].meeting_id, entry)
+        return positions
+
+    async def queue_position(self, meeting_id: int) -> dict | None:
+        """Return the queue entry of a meeting's pending job, if any."""
+        return (await self.queue_positions()).get(meeting_id)
+
+    @staticmethod
+    async def list_jobs(statuses: list[str] | None = None) -> list[DB_Job]:
+        """Return jobs, optionally only those in statuses."""
+        jobs = await select_many_from_table(DB_Job, statuses, "status")
+        return sorted(jobs, key=lambda job: job.id)
+
+    @staticmethod
+    async def requeue(job_ids: list[int]) -> list[DB_Job]:
+        """Reset dead or pending jobs to run again as soon as possible,
+        and return them.
+
+        Running jobs are left alone, so a meeting is never run by two
+        workers at once.
+        """
+        requeued = []
+        for job in await select_many_from_table(DB_Job, job_ids):
+            if job.status not in ("Dead", "Pending"):
+                continue
+            requeued += await update_table(
+                DB_Job,
+                {"status": "Pending", "attempts": 0, "next_run_at": None,
+                 "claimed_by": None, "lease_expires": None},
+                {"id": job.id, "status": job.status}
+            )
+        return requeued
+
+
+async def main():
+    """List or requeue stage jobs."""
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-v", "--verbose",
+                        help="increase output verbosity",
+                        action="store_true")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    list_parser = commands.add_parser("list", help="list jobs")
+    list_parser.add_argument("-s", "--status", action="append",
+                             help="only list jobs with this status")
+
+    queue_parser = commands.add_parser(
+        "queue", help="show pending jobs in the order they will run")
+    queue_parser.add_argument("stage", choices=list(STAGE_RTF))
+
+    requeue_parser = commands.add_parser("requeue", help="requeue jobs")
+    requeue_parser.add_argument("ids", type=int, nargs="*",
+                                help="ids of jobs to requeue")
+    requeue_parser.add_argument("--dead", action="store_true",
+                                help="requeue all dead jobs")
+
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig()
+    if args.verbose:
+        logging.getLogger().setLevel(logging.DEBUG)
+    else:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    if args.command == "list":
+        for job in await JobQueue.list_jobs(args.status):
+            next_run = job.next_run_at.isoformat() if job.next_run_at else "-"
+            print(f"{job.id}\t{job.meeting_id}\t{job.stage}\t{job.status}\t"
+                  f"{job.attempts}\t{next_run}\t{job.last_error or ''}")
+    elif args.command == "queue":
+        queue = await JobQueue("cli").queue(args.stage)
+        for entry in queue:
+            job = entry["job"]
+            start = entry["estimated_start"].astimezone()
+            print(f"{entry['position']}\t{job.id}\t{job.meeting_id}\t"
+                  f"{entry['duration']:.0f}s\t{start:%Y-%m-%d %H:%M:%S}")
+    else:
+        job_ids = list(args.ids)
+        if args.dead:
+            job_ids += [job.id for job in await JobQueue.list_jobs(["Dead"])]
+        if not job_ids:
+            parser.error("no jobs to requeue")
+        requeued = await JobQueue.requeue(job_ids)
+        for job in requeued:
+            print(f"Requeued job {job.id} ({job.stage} of meeting "
+                  f"{job.meeting_id})")
+        skipped = set(job_ids) - {job.id for job in requeued}
+        if skipped:
+            print(f"Skipped jobs not dead or pending: "
+                  f"{', '.join(map(str, sorted(skipped)))}")
+
+
+if __name__ == "__main__":
+    if sys.platform == "win32":
+        asyncio.set_event_loop_policy(
+            asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(main())
@@ -1,7 +1,7 @@
 import logging
 from datetime import datetime
 
-from .RAG import RAG
+from .audio_store import AudioStore
 
 from ..models import DB_Meeting, DB_MeetingTag, DB_Tag, DB_ActionItem
 from ..models import DB_KeyPoint
@@ -13,6 +13,9 @@ class Manager:
     _logger = logging.getLogger(__name__)
 
     def __init__(self):
+        # Imported here so processes only using the static helpers, such as
+        # ASR workers, need not load langchain
+        from .RAG import RAG
         self.rag = RAG()
 
     @staticmethod
@@ -24,9 +27,11 @@ class Manager:
         return await select_many_from_table(DB_Tag)
 
     @classmethod
-    async def create_tag(cls, name, meetings: list[DB_Meeting]) -> DB_Tag:
+    async def create_tag(cls, name, meetings: list[DB_Meeting],
+                         language: str | None = None) -> DB_Tag:
         tag = await insert_into_table(
-            DB_Tag(name=name, last_modified=datetime.now()),
+            DB_Tag(name=name, last_modified=datetime.now(),
+                   language=language),
             always_return_list=False
         )
         cls._logger.debug(f"Tag added: {tag.name}")
@@ -37,7 +42,8 @@ class Manager:
     @classmethod
     async def create_meeting(
             cls, name: str, date: datetime, file_recording: str,
-            file_transcript: str, summary: str
+            file_transcript: str, summary: str,
+            language: str | None = None
     ) -> DB_Meeting:
         meeting = await insert_into_table(
             DB_Meeting(
@@ -46,12 +52,41 @@ class Manager:
                 file_recording=file_recording,
                 file_transcript=file_transcript,
                 summary=summary,
-                status="Queued"
+                status="Queued",
+                duration=AudioStore.probe_duration(file_recording),
+                language=language
             ), always_return_list=False
         )
         cls._logger.debug(f"Meeting added: {meeting.name}")
         return meeting
 
+    @staticmethod
+    async def get_meeting_tags(meeting: DB_Meeting) -> list[DB_Tag]:
+        return await select_with_joins(
+            meeting.id, [DB_Meeting, DB_MeetingTag, DB_Tag]
+        )
+
+    @staticmethod
+    async def get_meeting_language(meeting: DB_Meeting) -> str | None:
+        """Return the language hint of a meeting, else of its tags."""
+        if meeting.language:
+            return meeting.language
+        tags = await Manager.get_meeting_tags(meeting)
+        languages = sorted({tag.language for tag in tags if tag.language})
+        return languages[0] if languages else None
+
+    @staticmethod
+    async def get_speaker_group(meeting: DB_Meeting) -> str | None:
+        """Return the group sharing known speakers with a meeting.
+
+        Meetings of a recurring series share a tag, the oldest tag of a
+        meeting identifies its series.
+        """
+        tags = await Manager.get_meeting_tags(meeting)
+        if not tags:
+            return None
+        return f"tag_{min(tag.id for tag in tags)}"
+
     @staticmethod
     async def create_action_item(item: str, meeting: DB_Meeting):
         return await insert_into_table(
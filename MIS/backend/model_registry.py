@@ -0,0 +1,160 @@
+import gc
+import logging
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Callable, Hashable
+
+import torch
+
+
+class ModelRegistry:
+
+    def __init__(self, memory_budget: float | None = None,
+                 max_entries: int | None = None):
+        """Initialise a least-recently-used registry of loaded models.
+
+        memory_budget is the total estimated size (in MB) of models kept
+        resident, max_entries optionally caps the number of models. None
+        disables the respective limit.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.memory_budget = memory_budget
+        self.max_entries = max_entries
+
+        # Key -> (model, estimated size in MB), oldest use first
+        self._models: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+
+        # Stages may fetch models from several threads at once
+        self._lock = threading.RLock()
+
+        # Key -> (event set once loaded, estimated size in MB) of models
+        # being loaded. Loads run outside the lock, so hits on other models
+        # are never held up by a slow load
+        self._loading: dict[Hashable, tuple[threading.Event, float]] = {}
+
+        # Usage counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_time = 0.0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._models
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def keys(self) -> list[Hashable]:
+        """Return keys of resident models, least recently used first."""
+        with self._lock:
+            return list(self._models)
+
+    @property
+    def memory_used(self) -> float:
+        """Total estimated size (in MB) of resident models."""
+        return sum(size for _, size in self._models.values())
+
+    def get(self, key: Hashable, loader: Callable[[], Any],
+            size: float = 0.0) -> Any:
+        """Return the model for key, calling loader to load it on a miss.
+
+        Callers missing on a model another thread is loading wait for that
+        load instead of loading it again.
+        """
+        while True:
+            with self._lock:
+                if key in self._models:
+                    self.hits += 1
+                    self._models.move_to_end(key)
+                    return self._models[key][0]
+
+                if key not in self._loading:
+                    self.misses += 1
+
+                    # Make room before loading so peak memory stays within
+                    # budget
+                    self._evict(size)
+                    loaded = threading.Event()
+                    self._loading[key] = (loaded, size)
+                    break
+
+                loaded = self._loading[key][0]
+
+            # Check again once loaded, or load it if the other load failed
+            loaded.wait()
+
+        try:
+            time = monotonic()
+            model = loader()
+            duration = monotonic() - time
+        except BaseException:
+            with self._lock:
+                del self._loading[key]
+            loaded.set()
+            raise
+
+        with self._lock:
+            self.load_time += duration
+            self._models[key] = (model, size)
+            del self._loading[key]
+        loaded.set()
+        self.logger.debug(f"Loaded model {key} in {duration:.3f}s")
+        return model
+
+    def evict(self, key: Hashable) -> None:
+        """Remove a single model from the registry and free its memory."""
+        with self._lock:
+            if key not in self._models:
+                return
+            del self._models[key]
+            self.evictions += 1
+        self.logger.debug(f"Evicted model {key}")
+        self._free_memory()
+
+    def clear(self) -> None:
+        """Remove all models from the registry and free their memory."""
+        with self._lock:
+            self.evictions += len(self._models)
+            self._models.clear()
+        self._free_memory()
+
+    def stats(self) -> dict:
+        """Return hit/miss, eviction and load time counters."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "load_time": self.load_time,
+            "resident": len(self._models),
+            "memory_used": self.memory_used,
+        }
+
+    def _evict(self, incoming: float) -> None:
+        """Evict least recently used models until incoming fits."""
+        evicted = False
+        while self._models and self._over_limit(incoming):
+            key, _ = self._models.popitem(last=False)
+            self.evictions += 1
+            evicted = True
+            self.logger.debug(f"Evicted model {key}")
+
+        if evicted:
+            self._free_memory()
+
+    def _over_limit(self, incoming: float) -> bool:
+        # Models being loaded count against the limits already
+        loading = sum(size for _, size in self._loading.values())
+        if self.max_entries is not None:
+            if len(self._models) + len(self._loading) + 1 > self.max_entries:
+                return True
+        if self.memory_budget is not None:
+            if self.memory_used + loading + incoming > self.memory_budget:
+                return True
+        return False
+
+    @staticmethod
+    def _free_memory() -> None:
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
@@ -0,0 +1,115 @@
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+
+
+class SpeakerStore:
+
+    def __init__(self, path: str = "data/speakers",
+                 threshold: float | None = None):
+        """Initialise a store of known speakers per group of meetings.
+
+        Each group, such as a tag of recurring meetings, keeps the centroid
+        of every speaker's embeddings in path/<group>.json. Speakers whose
+        embedding has at least threshold cosine similarity to a centroid
+        are matched to that known speaker. The store is persistent, so
+        path must not be inside an evicting cache.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path)
+        if threshold is None:
+            threshold = float(os.getenv("ASR_SPEAKER_THRESHOLD", "0.6"))
+        self.threshold = threshold
+
+        # Groups may be updated from several stage threads
+        self._lock = threading.Lock()
+
+    def group_path(self, group: str) -> Path:
+        """Return the file the speakers of a group are stored in."""
+        return self.path / f"{group}.json"
+
+    def load(self, group: str) -> dict[str, dict]:
+        """Return speaker name -> centroid and count of a group."""
+        try:
+            with open(self.group_path(group), "r", encoding="utf-8") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            self.logger.warning(f"Ignoring invalid speakers of {group}")
+            return {}
+
+    def save(self, group: str, speakers: dict[str, dict]) -> None:
+        """Store the speakers of a group atomically."""
+        os.makedirs(self.path, exist_ok=True)
+        path = self.group_path(group)
+        temp_path = path.with_suffix(".tmp")
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(speakers, file)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def similarity(a, b) -> float:
+        """Return the cosine similarity of two embeddings."""
+        a = np.asarray(a, dtype=np.float64)
+        b = np.asarray(b, dtype=np.float64)
+        norm = np.linalg.norm(a) * np.linalg.norm(b)
+        return float(a @ b / norm) if norm else 0.0
+
+    def match(self, group: str, embeddings: dict[str, list[float]],
+              update: bool = True) -> dict[str, str]:
+        """Return diarization label -> known speaker name of a group.
+
+        Labels are matched greedily by similarity, at most one label per
+        known speaker. Unmatched labels become new speakers of the group,
+        which are always stored so their names are not reused for other
+        people. With update, matched centroids also move towards the new
+        embeddings, which should only be done once per recording.
+        """
+        with self._lock:
+            speakers = self.load(group)
+
+            pairs = sorted(
+                ((self.similarity(embedding, known["centroid"]), label, name)
+                 for label, embedding in embeddings.items()
+                 for name, known in speakers.items()),
+                reverse=True)
+
+            mapping = {}
+            for score, label, name in pairs:
+                if score < self.threshold:
+                    break
+                if label in mapping or name in mapping.values():
+                    continue
+                mapping[label] = name
+
+            for label in sorted(embeddings):
+                if label not in mapping:
+                    mapping[label] = f"SPEAKER_{len(speakers):02d}"
+                    speakers[mapping[label]] = {"centroid": None, "count": 0}
+
+            self.logger.debug(f"Matched speakers of {group}: {mapping}")
+
+            # Running mean of each speaker's embeddings
+            changed = False
+            for label, name in mapping.items():
+                known = speakers[name]
+                embedding = np.asarray(embeddings[label], dtype=np.float64)
+                if known["centroid"] is None:
+                    centroid = embedding
+                elif update:
+                    centroid = np.asarray(known["centroid"])
+                    centroid += (embedding - centroid) / (known["count"] + 1)
+                else:
+                    continue
+                known["centroid"] = centroid.tolist()
+                known["count"] += 1
+                changed = True
+
+            if changed:
+                self.save(group, speakers)
+            return mapping
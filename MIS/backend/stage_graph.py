@@ -0,0 +1,70 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from concurrent.futures import FIRST_COMPLETED
+from time import monotonic
+from typing import Any, Callable
+
+
+class StageGraph:
+
+    def __init__(self, max_workers: int | None = None):
+        """Initialise an empty graph of dependent processing stages.
+
+        Stages whose dependencies have finished run concurrently on a
+        thread pool of max_workers threads.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_workers = max_workers
+        self.stages: dict[str, tuple[Callable, tuple[str, ...]]] = {}
+
+        # Stage name -> wall clock duration of the last run in seconds
+        self.timings: dict[str, float] = {}
+
+    def add(self, name: str, func: Callable, *dependencies: str) -> None:
+        """Add a stage, called with the results of its dependencies."""
+        for dependency in dependencies:
+            if dependency not in self.stages:
+                raise ValueError(f"Unknown dependency '{dependency}' "
+                                 f"of stage '{name}'")
+        self.stages[name] = (func, dependencies)
+
+    def run(self) -> dict[str, Any]:
+        """Run all stages and return their results by name.
+
+        If a stage raises, stages not yet started are cancelled and the
+        exception is re-raised.
+        """
+        self.timings = {}
+        results: dict[str, Any] = {}
+        running: dict[Future, str] = {}
+        pending = dict(self.stages)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                # Start every stage whose dependencies have finished
+                for name, (func, dependencies) in list(pending.items()):
+                    if all(d in results for d in dependencies):
+                        args = [results[d] for d in dependencies]
+                        future = executor.submit(self._timed, name, func,
+                                                 *args)
+                        running[future] = name
+                        del pending[name]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception:
+                        for other in running:
+                            other.cancel()
+                        raise
+
+        return results
+
+    def _timed(self, name: str, func: Callable, *args) -> Any:
+        time = monotonic()
+        result = func(*args)
+        self.timings[name] = monotonic() - time
+        self.logger.debug(f"Stage '{name}' took {self.timings[name]:.3f}s")
+        return result
@@ -0,0 +1,90 @@
+import json
+import os
+from pathlib import Path
+from time import monotonic
+from typing import Iterable, Iterator
+
+
+class TranscriptWriter:
+
+    def __init__(self, path: str | Path, flush_every: int = 50,
+                 flush_interval: float = 5.0):
+        """Initialise a streaming JSONL transcript writer.
+
+        Records are appended to a .partial file next to path, flushed every
+        flush_every records or flush_interval seconds, and the file is
+        renamed to path once closed without error.
+        """
+        self.path = Path(path)
+        self.partial = self.partial_path(self.path)
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._file = None
+        self._unflushed = 0
+        self._last_flush = monotonic()
+
+    @staticmethod
+    def partial_path(path: str | Path) -> Path:
+        """Return the path a transcript is written to until complete."""
+        path = Path(path)
+        return path.with_name(path.name + ".partial")
+
+    @staticmethod
+    def segment_record(segment: dict) -> dict:
+        """Convert a transcript segment to a JSONL record."""
+        # Label if speaker is identified or unknown
+        return {
+            "speaker": segment.get("speaker", "UNKNOWN_SPEAKER"),
+            "start_time": segment["start"],
+            "end_time": segment["end"],
+            "text": segment["text"].strip(),
+        }
+
+    @staticmethod
+    def read_lines(path: str | Path) -> Iterator[dict]:
+        """Yield records of a finished transcript."""
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+
+    def __enter__(self):
+        os.makedirs(self.path.parent, exist_ok=True)
+        self._file = open(self.partial, "w", encoding="utf-8")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            # Leave no partial transcript behind for a failed run
+            self._file.close()
+            self.partial.unlink(missing_ok=True)
+
+    def write(self, segment: dict) -> None:
+        """Append a transcript segment as a JSONL record."""
+        record = self.segment_record(segment)
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._unflushed += 1
+
+        due = monotonic() - self._last_flush > self.flush_interval
+        if self._unflushed >= self.flush_every or due:
+            self.flush()
+
+    def write_all(self, segments: Iterable[dict]) -> None:
+        """Append several transcript segments."""
+        for segment in segments:
+            self.write(segment)
+
+    def flush(self) -> None:
+        """Write buffered records out to the partial file."""
+        self._file.flush()
+        self._unflushed = 0
+        self._last_flush = monotonic()
+
+    def close(self) -> None:
+        """Finish the transcript and move it into place atomically."""
+        self.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.partial, self.path)
@@ -0,0 +1,122 @@
+from bisect import bisect_right
+from pathlib import Path
+
+import numpy as np
+
+from .audio_store import SAMPLE_RATE
+
+
+class SpeechMap:
+
+    def __init__(self, regions: list[tuple[int, int]], length: int):
+        """Initialise a map of speech regions within a recording.
+
+        regions are (start, end) sample index pairs of speech in the
+        original recording, length is the recording length in samples.
+        """
+        self.regions = regions
+        self.length = length
+
+        # Start of each region within the condensed, speech only audio
+        self.condensed_starts = []
+        position = 0
+        for start, end in regions:
+            self.condensed_starts.append(position)
+            position += end - start
+        self.condensed_length = position
+
+    @classmethod
+    def detect(cls, audio: np.ndarray, margin: float = 12.0,
+               min_silence: float = 1.0, padding: float = 0.25,
+               frame: int = SAMPLE_RATE // 50,
+               block: int = SAMPLE_RATE * 600) -> "SpeechMap":
+        """Find speech regions of audio by frame energy.
+
+        Frames louder than the noise floor (10th percentile of frame
+        energy) by more than margin dB are speech. Gaps shorter than
+        min_silence seconds are kept and regions are padded by padding
+        seconds. Audio is read in blocks so memory-mapped audio is never
+        loaded in full.
+        """
+        # Frame energy in dB, computed a block at a time
+        energies = []
+        for offset in range(0, len(audio) - frame + 1, block):
+            region = np.asarray(audio[offset:offset + block],
+                                dtype=np.float32)
+            frames = len(region) // frame
+            squares = np.square(region[:frames * frame].reshape(frames,
+                                                                frame))
+            energies.append(10 * np.log10(squares.mean(axis=1) + 1e-10))
+
+        if not energies:
+            return cls([], len(audio))
+        energy = np.concatenate(energies)
+
+        threshold = np.percentile(energy, 10) + margin
+        speech = energy > threshold
+
+        # Convert speech frames into padded regions, merging short gaps
+        pad = int(padding * SAMPLE_RATE)
+        gap = int(min_silence * SAMPLE_RATE)
+        regions = []
+        edges = np.flatnonzero(np.diff(np.concatenate(([0], speech, [0]))))
+        for first, last in zip(edges[::2], edges[1::2]):
+            start = max(0, first * frame - pad)
+            end = min(len(audio), last * frame + pad)
+            if regions and start - regions[-1][1] < gap:
+                regions[-1] = (regions[-1][0], end)
+            else:
+                regions.append((start, end))
+
+        return cls(regions, len(audio))
+
+    @property
+    def removed_seconds(self) -> float:
+        """Seconds of non-speech audio dropped from the recording."""
+        return (self.length - self.condensed_length) / SAMPLE_RATE
+
+    def condense(self, audio: np.ndarray, path: Path) -> np.ndarray:
+        """Write the speech regions of audio back to back to a PCM file.
+
+        Returns the condensed audio memory-mapped from path.
+        """
+        if self.condensed_length == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        condensed = np.memmap(path, dtype=np.float32, mode="w+",
+                              shape=(self.condensed_length,))
+        for (start, end), position in zip(self.regions,
+                                          self.condensed_starts):
+            condensed[position:position + end - start] = audio[start:end]
+        condensed.flush()
+
+        return np.memmap(path, dtype=np.float32, mode="c")
+
+    def to_original(self, seconds: float) -> float:
+        """Map a time in the condensed audio to the original recording."""
+        if not self.regions:
+            return seconds
+        position = seconds * SAMPLE_RATE
+        index = max(0, bisect_right(self.condensed_starts, position) - 1)
+        start, end = self.regions[index]
+        offset = min(position - self.condensed_starts[index], end - start)
+        return (start + offset) / SAMPLE_RATE
+
+    def remap(self, result: dict) -> None:
+        """Map segment and word timestamps of a result in place."""
+        words = list(result.get("word_segments", []))
+        for segment in result["segments"]:
+            words.extend(segment.get("words", []))
+            for key in ("start", "end"):
+                if key in segment:
+                    segment[key] = self.to_original(segment[key])
+
+        # Words may be shared between segments and word_segments
+        seen = set()
+        for word in words:
+            if id(word) in seen:
+                continue
+            seen.add(id(word))
+            for key in ("start", "end"):
+                if key in word:
+                    word[key] = self.to_original(word[key])
@@ -0,0 +1,150 @@
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Iterable, Iterator
+
+import numpy as np
+
+
+# Column file name -> dtype, one value per word
+COLUMNS = {
+    "start": np.float32,
+    "end": np.float32,
+    "score": np.float32,
+    "speaker": np.int16,
+    "offset": np.int64,
+}
+
+
+class WordStoreWriter:
+
+    def __init__(self, path: str | Path):
+        """Initialise a writer of word-level transcript columns.
+
+        Words are appended to raw column files in a temporary directory,
+        which replaces path once closed without error.
+        """
+        self.path = Path(path)
+        self.temp_path = self.path.with_name(self.path.name + ".tmp")
+        self.count = 0
+        self.speakers: dict[str, int] = {}
+        self._files = {}
+        self._text = None
+        self._offset = 0
+        self._last_end = 0.0
+
+    def __enter__(self):
+        shutil.rmtree(self.temp_path, ignore_errors=True)
+        os.makedirs(self.temp_path)
+        for column in COLUMNS:
+            self._files[column] = open(self.temp_path / f"{column}.bin", "wb")
+        self._text = open(self.temp_path / "text.bin", "wb")
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        for file in list(self._files.values()) + [self._text]:
+            file.close()
+
+        if exc_type is not None:
+            shutil.rmtree(self.temp_path, ignore_errors=True)
+            return
+
+        meta = {"count": self.count, "speakers": list(self.speakers)}
+        with open(self.temp_path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self.temp_path, self.path)
+
+    def write(self, words: Iterable[dict]) -> None:
+        """Append WhisperX word segments.
+
+        Words that could not be aligned take the timing of the word before
+        them so start times stay sorted, and have a NaN score.
+        """
+        columns = {column: [] for column in COLUMNS}
+        for word in words:
+            start = word.get("start", self._last_end)
+            end = word.get("end", start)
+            self._last_end = end
+
+            speaker = word.get("speaker")
+            if speaker is None:
+                speaker_index = -1
+            else:
+                speaker_index = self.speakers.setdefault(speaker,
+                                                         len(self.speakers))
+
+            text = word["word"].encode("utf-8")
+            self._text.write(text)
+            self._offset += len(text)
+
+            columns["start"].append(start)
+            columns["end"].append(end)
+            columns["score"].append(word.get("score", np.nan))
+            columns["speaker"].append(speaker_index)
+            columns["offset"].append(self._offset)
+            self.count += 1
+
+        for column, dtype in COLUMNS.items():
+            values = np.asarray(columns[column], dtype=dtype)
+            self._files[column].write(values.tobytes())
+
+
+class WordStore:
+
+    def __init__(self, path: str | Path):
+        """Open word-level transcript columns memory-mapped from path."""
+        self.path = Path(path)
+        with open(self.path / "meta.json", "r", encoding="utf-8") as file:
+            meta = json.load(file)
+        self.count = meta["count"]
+        self.speakers = meta["speakers"]
+
+        for column, dtype in COLUMNS.items():
+            setattr(self, column, self._map(f"{column}.bin", dtype))
+        self.text = self._map("text.bin", np.uint8)
+
+    def _map(self, name: str, dtype) -> np.ndarray:
+        # Empty files cannot be memory-mapped
+        if os.path.getsize(self.path / name) == 0:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(self.path / name, dtype=dtype, mode="r")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def word(self, index: int) -> str:
+        """Return the text of a word."""
+        start = self.offset[index - 1] if index > 0 else 0
+        return self.text[start:self.offset[index]].tobytes().decode("utf-8")
+
+    def words(self, start: int = 0, end: int | None = None) -> Iterator[str]:
+        """Yield the text of words from index start to end."""
+        for index in range(start, self.count if end is None else end):
+            yield self.word(index)
+
+    def speaker_of(self, index: int) -> str | None:
+        """Return the speaker of a word, None if unknown."""
+        speaker_index = self.speaker[index]
+        return None if speaker_index < 0 else self.speakers[speaker_index]
+
+    def at(self, seconds: float) -> int:
+        """Return the index of the last word starting at or before seconds."""
+        return max(0, int(np.searchsorted(self.start, seconds,
+                                          side="right")) - 1)
+
+    def between(self, start: float, end: float) -> slice:
+        """Return the index range of words starting between two times."""
+        first = int(np.searchsorted(self.start, start, side="left"))
+        last = int(np.searchsorted(self.start, end, side="left"))
+        return slice(first, last)
+
+    def speaker_durations(self) -> dict[str, float]:
+        """Return total seconds of words spoken by each speaker."""
+        durations = np.asarray(self.end) - np.asarray(self.start)
+        known = np.asarray(self.speaker) >= 0
+        totals = np.bincount(self.speaker[known], weights=durations[known],
+                             minlength=len(self.speakers))
+        return dict(zip(self.speakers, totals.tolist()))
@@ -0,0 +1,212 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class StageWorker:
+
+    def __init__(self, name: str,
+                 fetch: Callable[[int], Awaitable[list[Any]]],
+                 handle: Callable[[Any], Awaitable[None]],
+                 concurrency: int | None = None,
+                 poll_interval: float | None = None,
+                 key: Callable[[Any], Hashable] = lambda item: item.id):
+        """Initialise a worker processing items of one pipeline stage.
+
+        fetch returns up to a given number of items waiting for this stage,
+        which are processed by concurrency handle calls at once. Items are
+        only fetched for idle handlers, so items fetched by claiming them
+        are left for other workers while this one is busy. Unset
+        concurrency is read from <NAME>_CONCURRENCY, defaulting to one.
+
+        When idle, the worker fetches again once woken by wake(), or after
+        poll_interval seconds (WORKER_POLL_SECONDS) in case a wakeup was
+        missed.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+        self.fetch = fetch
+        self.handle = handle
+        self.key = key
+        if poll_interval is None:
+            poll_interval = float(os.getenv("WORKER_POLL_SECONDS", "30"))
+        self.poll_interval = poll_interval
+        self._wakeup = asyncio.Event()
+
+        prefix = name.upper()
+        if concurrency is None:
+            concurrency = int(os.getenv(f"{prefix}_CONCURRENCY", "1"))
+        self.concurrency = max(1, concurrency)
+        self.queue: asyncio.Queue = asyncio.Queue()
+
+        # Keys of items queued or being handled, so items still waiting
+        # for this stage are not fetched twice
+        self.in_flight: set[Hashable] = set()
+
+    def wake(self) -> None:
+        """Fetch new items now, as some may have become available."""
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        """Fetch and handle items until cancelled."""
+        consumers = [asyncio.create_task(self.consume())
+                     for _ in range(self.concurrency)]
+        try:
+            await self.produce()
+        finally:
+            for consumer in consumers:
+                consumer.cancel()
+            await asyncio.gather(*consumers, return_exceptions=True)
+
+    async def produce(self) -> None:
+        """Queue new items as they become available."""
+        while True:
+            # Wakeups during the fetch are kept for the next wait
+            self._wakeup.clear()
+            free = self.concurrency - len(self.in_flight)
+            try:
+                items = await self.fetch(free) if free > 0 else []
+            except Exception as e:
+                self.logger.error(f"{self.name}: fetch failed: {e}")
+                items = []
+
+            new_items = [item for item in items
+                         if self.key(item) not in self.in_flight]
+            for item in new_items:
+                self.in_flight.add(self.key(item))
+                await self.queue.put(item)
+
+            if not new_items:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(),
+                                           self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def consume(self) -> None:
+        """Handle queued items one at a time."""
+        while True:
+            item = await self.queue.get()
+            try:
+                self.logger.debug(f"{self.name}: handling {self.key(item)}")
+                await self.handle(item)
+            except Exception as e:
+                self.logger.exception(
+                    f"{self.name}: failed on {self.key(item)}: {e}")
+            finally:
+                self.in_flight.discard(self.key(item))
+                self.queue.task_done()
+                self.wake()
+
+
+class StageExecutor:
+
+    def __init__(self, name: str, kind: str | None = None,
+                 workers: int | None = None, timeout: float | None = None):
+        """Initialise an executor running blocking calls of a stage.
+
+        kind is "thread" or "process", workers the number of calls run at
+        once and timeout the seconds a call may take, None or 0 for no
+        limit. Unset values are read from <NAME>_EXECUTOR,
+        <NAME>_EXECUTOR_WORKERS and <NAME>_TIMEOUT, defaulting to one
+        thread without a timeout.
+
+        Threads cannot be stopped, so a thread that times out or is
+        cancelled runs on in the background, holding any locks it took,
+        and later calls run in new threads. Processes are terminated, so a
+        timeout should be used with processes. Processes are spawned and
+        import the main module again, so entry scripts must guard their
+        entry call with __name__ == "__main__".
+        """
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+
+        prefix = name.upper()
+        if kind is None:
+            kind = os.getenv(f"{prefix}_EXECUTOR", "thread")
+        if workers is None:
+            workers = int(os.getenv(f"{prefix}_EXECUTOR_WORKERS", "1"))
+        if timeout is None:
+            timeout = float(os.getenv(f"{prefix}_TIMEOUT", "0"))
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown executor kind for {name}: {kind}")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.timeout = timeout or None
+        self.executor = self._create()
+
+        if self.kind == "thread" and self.timeout is not None:
+            self.logger.warning(f"{name}: calls that time out keep running "
+                                f"in threads, set {prefix}_EXECUTOR to "
+                                f"process to stop them")
+
+    def _create(self) -> Executor:
+        if self.kind == "process":
+            # Spawned processes can initialise CUDA safely
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"))
+        return ThreadPoolExecutor(max_workers=self.workers,
+                                  thread_name_prefix=self.name)
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Return the result of a blocking call run in the executor.
+
+        Functions run in processes, and their arguments and results, must
+        be picklable.
+        """
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        future = loop.run_in_executor(
+            executor, functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            self.logger.error(f"{self.name}: {func.__name__} timed out "
+                              f"after {self.timeout:.0f}s")
+            self.stop(executor)
+            raise
+        except asyncio.CancelledError:
+            self.logger.warning(f"{self.name}: {func.__name__} cancelled")
+            self.stop(executor)
+            raise
+        except BrokenProcessPool:
+            # A broken pool fails every later call, replace it so the job
+            # can be retried
+            self.logger.error(f"{self.name}: process pool broke running "
+                              f"{func.__name__}")
+            self.stop(executor)
+            raise
+
+    def stop(self, executor: Executor | None = None) -> None:
+        """Stop running calls, as far as the executor kind allows, and
+        replace the executor for later calls.
+
+        Terminating processes also fails any other calls running in them.
+        Threads are left running, and calls queued behind them run once
+        they finish. With executor, nothing is done if it was already
+        replaced.
+        """
+        if executor is not None and executor is not self.executor:
+            return
+
+        if self.kind == "process":
+            for process in list((self.executor._processes or {}).values()):
+                process.terminate()
+        else:
+            self.logger.warning(f"{self.name}: thread left running")
+        self.executor.shutdown(wait=False)
+        self.executor = self._create()
+
+    def shutdown(self) -> None:
+        """Release the executor's threads or processes."""
+        if self.kind == "process":
+            for process in list((self.executor._processes or {}).values()):
+                process.terminate()
+        self.executor.shutdown(wait=False, cancel_futures=True)
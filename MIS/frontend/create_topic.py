@@ -1,5 +1,5 @@
 import streamlit as st
-from MIS.frontend.interface import Server
+from MIS.frontend.interface import Server, LANGUAGES
 import streamlit_tags as stt
 import asyncio
 
@@ -35,6 +35,10 @@ selected_meetings = stt.st_tags(
     key="hello"
 )
 
+# Meetings of the topic are transcribed in its language
+language = st.selectbox("What language are meetings of this topic in?",
+                        options=list(LANGUAGES))
+
 want_create = st.button("Create")
 
 if want_create:
@@ -44,7 +48,8 @@ if want_create:
         Server.create_topic(
             meeting_name,
             [m for m in existing_meetings
-             if m.name.lower() in selected_meetings]
+             if m.name.lower() in selected_meetings],
+            LANGUAGES[language]
         )
     )
 
@@ -37,6 +37,21 @@ for i, topic in enumerate(all_topics):
     topic_colours[topic.name] = colours[i % len(colours)]
 
 latest_meetings = asyncio.run(get_top_meetings())
+queue_positions = asyncio.run(Server.get_queue_positions())
+
+
+def processing_caption(meeting: Meeting) -> str | None:
+    """Describe the processing of a meeting, None once it is ready."""
+    entry = queue_positions.get(meeting.id)
+    if entry is not None:
+        start = entry["estimated_start"].astimezone()
+        return (f"Waiting to {entry['job'].stage}: number "
+                f"{entry['position']} in the queue, expected to start "
+                f"around {start:%H:%M}")
+    if meeting.status != "Ready":
+        return f"Processing ({meeting.status})"
+    return None
+
 
 # # MAKE FEED
 st.title("Your Feed")
@@ -53,6 +68,9 @@ if latest_meetings:
                                 vertical_alignment="center")
         with col1:
             st.header(meeting.name)
+            caption = processing_caption(meeting)
+            if caption is not None:
+                st.caption(caption)
         with col2:
             st.button(
                 "Transcript", on_click=transcript_btn_click,
@@ -1,6 +1,6 @@
 from __future__ import annotations
 from typing import List
-from datetime import datetime
+from datetime import datetime, timezone
 import asyncio
 
 from MIS.access import select_many_from_table, AccessBase, select_from_table
@@ -11,6 +11,8 @@ from MIS.models import DB_ActionItem
 import streamlit as st
 from streamlit.runtime.uploaded_file_manager import UploadedFile
 from MIS.backend.RAG import RAG
+from MIS.backend.audio_store import AudioStore
+from MIS.backend.jobs import JobQueue
 
 
 @st.cache_resource  # 👈 Add the caching decorator
@@ -21,6 +23,21 @@ def get_rag():
 
 rag = get_rag()
 
+# Languages recordings can be transcribed in, by name. A language skips
+# language detection, None leaves it to be detected
+LANGUAGES = {
+    "Detect automatically": None,
+    "English": "en",
+    "Chinese": "zh",
+    "French": "fr",
+    "German": "de",
+    "Italian": "it",
+    "Japanese": "ja",
+    "Korean": "ko",
+    "Portuguese": "pt",
+    "Spanish": "es",
+}
+
 
 class Server:
 
@@ -63,6 +80,12 @@ class Server:
         """Gets a Chat object for the chat based on its ID."""
         return Chat(await select_from_table(DB_Chat, id))
 
+    @staticmethod
+    async def get_queue_positions() -> dict[int, dict]:
+        """Returns the queue position and estimated start time of every
+        meeting waiting to be processed, by meeting ID."""
+        return await JobQueue("frontend").queue_positions()
+
     @staticmethod
     async def get_meeting_by_id(id: int) -> Meeting:
         """Gets a Meeting object based on its ID."""
@@ -70,10 +93,13 @@ class Server:
 
     @staticmethod
     async def upload_meeting(
-            name: str, date: datetime, file: UploadedFile, topics: List[Topic]
+            name: str, date: datetime, file: UploadedFile, topics: List[Topic],
+            priority: int = 0, language: str | None = None
     ) -> Meeting:
         """Uploads a meeting to the database, and returns a Meeting object
-        which captures the meeting."""
+        which captures the meeting. Meetings of higher priority are
+        processed sooner. A language overrides that of the topics, and is
+        otherwise detected."""
         filename = "data/recordings/" + file.name
         with open(filename, "wb") as audiofile:
             audiofile.write(file.read())
@@ -85,6 +111,9 @@ class Server:
                     file_recording=filename,
                     file_transcript=None,
                     summary="",
+                    duration=AudioStore.probe_duration(filename),
+                    priority=priority,
+                    language=language,
                 ), always_return_list=False
             )
         )
@@ -129,12 +158,15 @@ class Server:
         return chat
 
     @staticmethod
-    async def create_topic(name: str, meetings: List[Meeting]) -> Topic:
-        """Creates a new topic and returns it as a Topic object."""
+    async def create_topic(name: str, meetings: List[Meeting],
+                           language: str | None = None) -> Topic:
+        """Creates a new topic and returns it as a Topic object. Meetings
+        of the topic are transcribed in its language, if given."""
         topic = Topic(
             await insert_into_table(
                 DB_Tag(
-                    name=name
+                    name=name,
+                    language=language
                 )
             )
         )
@@ -169,6 +201,17 @@ class Topic:
         self._tag.name = value
         self._tag = await update_table_from_model(self._tag)
 
+    @property
+    def language(self) -> str | None:
+        """Gets the language meetings of the topic are transcribed in."""
+        return self._tag.language
+
+    @language.setter
+    async def language(self, value: str | None) -> None:
+        """Sets the language meetings of the topic are transcribed in."""
+        self._tag.language = value
+        self._tag = await update_table_from_model(self._tag)
+
     @property
     async def meetings(self):
         """Gets the list of meetings which have been put under this
@@ -239,6 +282,11 @@ class Meeting:
         """Gets the date of the meeting."""
         return self._meeting.date
 
+    @property
+    def status(self: Meeting) -> str:
+        """Gets the processing status of the meeting."""
+        return self._meeting.status
+
     @property
     async def topics(self: Meeting) -> List[Topic]:
         """Gets the list of topics which the meeting belongs to."""
@@ -267,6 +315,12 @@ class Meeting:
         """Gets the original upload for this meeting."""
         return self._meeting.file_recording
 
+    @property
+    async def queue_position(self: Meeting) -> dict | None:
+        """Gets the position and estimated start time of the meeting's
+        next processing stage, None if it is not waiting."""
+        return await JobQueue("frontend").queue_position(self._meeting.id)
+
     # def _link_topic(self: Meeting, topic: Topic) -> None:
     #     if topic not in self.topics:
     #         self._topics.append(topic)
@@ -354,6 +408,8 @@ class Chat:
                 "message": message
             }
         )
+        # Meetings of active chats are processed sooner
+        self._chat.last_active = datetime.now(timezone.utc)
         return await update_table_from_model(self._chat)
 
     async def send_message(self, text):
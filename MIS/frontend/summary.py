@@ -47,6 +47,7 @@ with col1:
 
 # TODO: change to allow for multiple meetings
 allMeetings = asyncio.run(chat.meetings)
+queue_positions = asyncio.run(Server.get_queue_positions())
 transcript_buttons = []
 summary_buttons = []
 
@@ -68,6 +69,13 @@ with col2.expander("Recent Meetings", expanded=True):
                     "%d/%m/%y"
                 )
             )
+            entry = queue_positions.get(meeting.id)
+            if entry is not None:
+                start = entry["estimated_start"].astimezone()
+                st.caption(f"Waiting to {entry['job'].stage} (number "
+                           f"{entry['position']}, around {start:%H:%M})")
+            elif meeting.status != "Ready":
+                st.caption(f"Processing ({meeting.status})")
         with bcol2:
             transcript_buttons.append(
                 st.button(
@@ -1,8 +1,8 @@
 from datetime import datetime, time
 import streamlit as st
 from MIS.frontend.interface import Server
+from MIS.backend.transcript_writer import TranscriptWriter
 import asyncio
-import json
 
 
 if "transcript_view_id" not in st.session_state:
@@ -81,28 +81,26 @@ speaker_colors = {}
 colorgen = colors()
 
 if meeting.transcript:
-    with open(meeting.transcript) as f:
-        for line in f.readlines():
-            line = json.loads(line)
-            speaker = line['speaker']
-            if speaker not in speaker_colors:
-                speaker_colors[speaker] = colorgen.__next__()
-            start_time = line['start_time']
-            hours, remainder = divmod(start_time, 3600)
-            minutes, seconds = divmod(remainder, 60)
-            start_time = time(hour=int(hours), minute=int(minutes),
-                              second=int(seconds))
-
-            start_time = start_time.strftime("%H:%M:%S" if hours > 0
-                                             else "%M:%S")
-
-            timestamp = f"{speaker_colors[speaker]}[{start_time}]"
-            text = line['text']
-            st.markdown(
-                f'''
-                :{timestamp} - :{speaker_colors[speaker]}[{speaker}]: {text}
-                '''
-            )
+    for line in TranscriptWriter.read_lines(meeting.transcript):
+        speaker = line['speaker']
+        if speaker not in speaker_colors:
+            speaker_colors[speaker] = colorgen.__next__()
+        start_time = line['start_time']
+        hours, remainder = divmod(start_time, 3600)
+        minutes, seconds = divmod(remainder, 60)
+        start_time = time(hour=int(hours), minute=int(minutes),
+                          second=int(seconds))
+
+        start_time = start_time.strftime("%H:%M:%S" if hours > 0
+                                         else "%M:%S")
+
+        timestamp = f"{speaker_colors[speaker]}[{start_time}]"
+        text = line['text']
+        st.markdown(
+            f'''
+            :{timestamp} - :{speaker_colors[speaker]}[{speaker}]: {text}
+            '''
+        )
 else:
     st.text(f"No filepath for this meeting: {meeting.name}")
 
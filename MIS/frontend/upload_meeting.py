@@ -1,7 +1,7 @@
 
 import streamlit as st
 import streamlit_tags as stt
-from MIS.frontend.interface import Server
+from MIS.frontend.interface import Server, LANGUAGES
 import asyncio
 
 want_back = None
@@ -37,6 +37,15 @@ print(selected_topics)
 print([t for t in existing_topics if t.name.lower() in selected_topics])
 
 
+# Meetings of higher priority are processed sooner
+priorities = {"Low": -1, "Normal": 0, "High": 1, "Urgent": 2}
+priority = st.select_slider("How soon do you need this meeting processed?",
+                            options=list(priorities), value="Normal")
+
+# A language skips detection, otherwise that of the topics is used
+language = st.selectbox("What language is the meeting in?",
+                        options=list(LANGUAGES))
+
 uploaded_file = st.file_uploader("Upload Recording/Transcript",
                                  type=['mp3', 'mp4', 'txt', 'wav'])
 
@@ -57,7 +66,9 @@ if next1:
             date=meeting_date,
             file=uploaded_file,
             topics=[t for t in existing_topics
-                    if t.name.lower() in selected_topics]
+                    if t.name.lower() in selected_topics],
+            priority=priorities[priority],
+            language=LANGUAGES[language]
         )
     )
     if "current_chat_id" not in st.session_state:
@@ -56,6 +56,13 @@ class DB_Meeting(DatabaseModel):
     file_transcript: str | None = None
     summary: str
     status: str = "Queued"
+    language: str | None = None
+    duration: float | None = None
+    priority: int = 0
+    drafted: bool = False
+    transcribed: bool = False
+    summarised: bool = False
+    embedded: bool = False
 
 
 class DB_KeyPoint(DatabaseModel):
@@ -86,6 +93,7 @@ class DB_Tag(DatabaseModel):
     id: int | None = None
     name: str
     last_modified: datetime | None = None
+    language: str | None = None
 
 
 class DB_MeetingTag(DatabaseModel):
@@ -99,6 +107,24 @@ class DB_MeetingTag(DatabaseModel):
     tag_id: int
 
 
+class DB_Job(DatabaseModel):
+    __tablename__ = "job"
+    __primarykey__ = "id"
+    __foreignkeys__ = {
+        'meeting_id': ('meeting', 'id')
+    }
+    id: int | None = None
+    meeting_id: int
+    stage: str
+    status: str = "Pending"
+    attempts: int = 0
+    queued_at: datetime | None = None
+    next_run_at: datetime | None = None
+    last_error: str | None = None
+    claimed_by: str | None = None
+    lease_expires: datetime | None = None
+
+
 class DB_Doc(DatabaseModel):
     __tablename__ = "document"
     __primarykey__ = "id"
@@ -119,6 +145,7 @@ class DB_Chat(DatabaseModel):
     name: str
     filter: dict = {}
     history: list = []
+    last_active: datetime | None = None
 
 
 class DB_ChatTag(DatabaseModel):
@@ -5,9 +5,8 @@ import argparse
 
 from dotenv import load_dotenv
 
-from MIS.backend.docker_manager import DockerManager
 from MIS.backend.database_manager import DB_Manager
-from MIS.backend.ingestion import Ingestion
+from MIS.backend.ingestion import Ingestion, ROLES
 
 load_dotenv()
 
@@ -16,11 +15,18 @@ if sys.platform == "win32":
 
 
 async def main():
-    """Runs the backend, infinitely looping over and processing meetings."""
+    """Runs the backend, processing meetings in concurrent stages."""
     parser = argparse.ArgumentParser()
     parser.add_argument("-v", "--verbose",
                         help="increase output verbosity",
                         action="store_true")
+    parser.add_argument("-r", "--role", action="append",
+                        choices=[*ROLES, "all"],
+                        help="pipeline stages to run, may be repeated "
+                             "(default: all)")
+    parser.add_argument("--no-setup", action="store_true",
+                        help="use the running database without starting "
+                             "or setting it up, e.g. on worker hosts")
 
     args = parser.parse_args()
 
@@ -30,14 +36,22 @@ async def main():
     else:
         logging.getLogger().setLevel(logging.WARNING)
 
-    with DockerManager(stop_when_done=False) as m:
-        m.full_setup()
+    roles = None
+    if args.role and "all" not in args.role:
+        roles = list(dict.fromkeys(args.role))
+
+    if not args.no_setup:
+        # Docker is only needed on the host running the database
+        from MIS.backend.docker_manager import DockerManager
+        with DockerManager(stop_when_done=False) as m:
+            m.full_setup()
         await DB_Manager.full_setup()
-        ingestion = Ingestion()
-        while True:
-            await ingestion.transcribe_next_meeting()
-            await ingestion.summarise_next_meeting()
-            await ingestion.ingest_next_meeting()
+
+    ingestion = Ingestion(roles)
+    await ingestion.run()
 
 
-asyncio.run(main())
+# Spawned worker processes import this module again, and must not start
+# another backend
+if __name__ == "__main__":
+    asyncio.run(main())